@@ -1,5 +1,6 @@
 from bedrock_agentcore import BedrockAgentCoreApp
-from agents.writer.writer import WriterAgent
+from agents.writer.agent_pool import WriterAgentPool
+from agents.writer.writer import WriterAgent, build_bedrock_model
 import os
 
 
@@ -10,50 +11,88 @@ app = BedrockAgentCoreApp()
 DEFAULT_MODEL_ID = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
 DEFAULT_REGION = "us-west-2"
 
+# Conversations kept in memory, requests served at once, and agents ready for requests without a session
+WRITER_MAX_SESSIONS = int(os.getenv("WRITER_MAX_SESSIONS", "64"))
+WRITER_MAX_CONCURRENCY = int(os.getenv("WRITER_MAX_CONCURRENCY", "8"))
+WRITER_POOL_PREWARM = int(os.getenv("WRITER_POOL_PREWARM", "2"))
 
-def _build_agent():
+
+def _build_model():
     model_id = os.getenv("BEDROCK_MODEL_ID", DEFAULT_MODEL_ID)
     region_name = os.getenv("AWS_REGION", os.getenv("AWS_DEFAULT_REGION", DEFAULT_REGION))
+    # Marks the system prompt and tool specs, identical for every request, for Bedrock prompt caching
+    return build_bedrock_model(model_id, region_name)
+
+
+# One Bedrock client shared by every agent in the pool
+shared_model = _build_model()
+
 
-    # Instantiate WriterAgent using Bedrock provider
+def _build_agent():
+    # Instantiate WriterAgent on the shared Bedrock model; each agent keeps its own messages
     return WriterAgent(
-        provider="bedrock",
-        bedrock_model_id=model_id,
-        aws_region=region_name,
+        model=shared_model,
         temperature=float(os.getenv("WRITER_TEMPERATURE", "0.7")),
     )
 
 
-writer_agent = _build_agent()
+writer_pool = WriterAgentPool(
+    _build_agent,
+    max_sessions=WRITER_MAX_SESSIONS,
+    max_concurrency=WRITER_MAX_CONCURRENCY,
+    prewarm=WRITER_POOL_PREWARM,
+)
 
 
 @app.entrypoint
 def invoke(payload: dict):
     """AgentCore entrypoint for WriterAgent.
 
-    Expected payload keys:
+    Expected payload keys (optionally nested under "input"):
     - prompt: str (direct prompt string)
     - input_prompt: dict (fields matching prompts.InputPrompt)
+    - stream: bool (stream text chunks as server-sent events instead of one response)
+    - session_id: str (conversation to continue; without it each request starts from an empty history)
+    - platforms: list[str] (one caption per platform from a single call, returned as {"captions": {...}})
+    - tools: list[str] (tools the model may call for this request; defaults to WriterAgent.exposed_tools)
+    - analysis: bool (add the local content analysis of the result as "analysis")
     """
     try:
         from prompts.InputPrompt import InputPrompt
 
-        prompt = payload.get("prompt")
-        input_prompt_data = payload.get("input_prompt")
-
-        if input_prompt_data:
-            # Coerce dict to InputPrompt dataclass
-            prompt_obj = InputPrompt(**input_prompt_data)
-            result = writer_agent.invoke(prompt_data=prompt_obj)
-        else:
-            result = writer_agent.invoke(query=prompt)
-
-        return {"result": result}
+        request = payload.get("input") or payload
+        prompt = request.get("prompt")
+        input_prompt_data = request.get("input_prompt")
+        prompt_obj = InputPrompt(**input_prompt_data) if input_prompt_data else None
+        # Only an explicit session continues a conversation. The backend sends the same runtime session
+        # for all traffic, so falling back to it would serialize every request on one agent
+        session_id = request.get("session_id") or payload.get("session_id")
+        platforms = request.get("platforms")
+        tools = request.get("tools")
+        include_analysis = bool(request.get("analysis"))
+
+        if platforms:
+            with writer_pool.lease(session_id) as writer_agent:
+                captions = writer_agent.invoke_platforms(platforms, prompt_data=prompt_obj, query=prompt, tools=tools)
+                analysis = writer_agent.last_analysis
+            return {"captions": captions, "analysis": analysis} if include_analysis else {"captions": captions}
+
+        if request.get("stream") or payload.get("stream"):
+            # Returning an async generator makes the runtime respond with text/event-stream
+            return writer_pool.stream(session_id, prompt_data=prompt_obj, query=prompt, tools=tools)
+
+        with writer_pool.lease(session_id) as writer_agent:
+            if prompt_obj:
+                # Coerce dict to InputPrompt dataclass
+                result = writer_agent.invoke(prompt_data=prompt_obj, tools=tools)
+            else:
+                result = writer_agent.invoke(query=prompt, tools=tools)
+            analysis = writer_agent.last_analysis
+
+        return {"result": result, "analysis": analysis} if include_analysis else {"result": result}
     except Exception as e:
         return {"error": str(e)}
 
 
 if __name__ == "__main__":
     app.run()
-
-
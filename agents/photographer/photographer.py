@@ -1,23 +1,63 @@
 from __future__ import annotations
 
+import contextvars
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from io import BytesIO
-from typing import Iterable, List, Optional
+from typing import Callable, Iterable, List, Optional, Tuple
 
 from PIL import Image
 from google import genai
 from google.genai import errors, types
 
+from agents.photographer.reference_preprocessor import ReferencePreprocessor
+from utils.telemetry import record_provider_error, record_provider_retry, stage
+
 
 logger = logging.getLogger(__name__)
 
+# Encodings Gemini accepts as-is, so files already in them never need re-encoding
+PASSTHROUGH_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "HEIF": "image/heif",
+}
+
+
 @dataclass
 class GeminiImage:
-    image: Image.Image
+    image: Optional[Image.Image] = None
     mime_type: str = "image/png"
+    # Original encoded bytes; when set they are uploaded as-is instead of re-encoding ``image``
+    data: Optional[bytes] = None
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GeminiImage":
+        """Wrap encoded image bytes, decoding only if the format has to be converted"""
+        with Image.open(BytesIO(data)) as probe:
+            # Image.open only parses the header; pixels are not decoded for pass-through formats
+            mime_type = PASSTHROUGH_FORMATS.get((probe.format or "").upper())
+            if mime_type:
+                return cls(mime_type=mime_type, data=data)
+            image = probe.convert("RGB") if probe.mode not in {"RGB", "RGBA"} else probe.copy()
+        return cls(image=image)
+
+    @classmethod
+    def from_path(cls, path: str) -> "GeminiImage":
+        with open(path, "rb") as handle:
+            return cls.from_bytes(handle.read())
 
     def to_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        if self.image is None:
+            raise ValueError("GeminiImage needs either encoded data or a PIL image.")
         buffer = BytesIO()
         try:
             format_hint = "PNG"
@@ -29,6 +69,86 @@ class GeminiImage:
             buffer.close()
 
 
+# Files uploaded through the Gemini Files API are deleted after 48 hours
+GEMINI_FILE_TTL_SECONDS = 48 * 3600
+# Stop reusing an uploaded file this long before the provider expires it
+FILE_EXPIRY_MARGIN_SECONDS = 3600
+
+
+@dataclass
+class CachedUpload:
+    uri: str
+    mime_type: str
+    expires_at: float
+
+
+class ReferenceUploadCache:
+    """Content-hash keyed cache of uploaded reference file URIs.
+
+    Entries expire ahead of the provider's own file expiry and the least
+    recently used entry is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = GEMINI_FILE_TTL_SECONDS - FILE_EXPIRY_MARGIN_SECONDS,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, CachedUpload]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(data: bytes, label: str) -> str:
+        return hashlib.sha256(label.encode("utf-8") + b"\0" + data).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedUpload]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self._clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, uri: str, mime_type: str, provider_expires_at: Optional[float] = None) -> CachedUpload:
+        expires_at = self._clock() + self._ttl_seconds
+        if provider_expires_at is not None:
+            expires_at = min(expires_at, provider_expires_at - FILE_EXPIRY_MARGIN_SECONDS)
+        entry = CachedUpload(uri=uri, mime_type=mime_type, expires_at=expires_at)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def _is_stale_file_error(error: errors.APIError) -> bool:
+    """Whether a generate call failed because a referenced file is gone or expired"""
+    if getattr(error, "code", None) in (403, 404):
+        return True
+    message = str(error).lower()
+    return "file" in message and any(word in message for word in ("not found", "expired", "not exist", "permission"))
+
+
 class GeminiPhotographer:
     def __init__(
         self,
@@ -38,11 +158,37 @@ class GeminiPhotographer:
         candidate_count: int = 4,
         aspect_ratio: Optional[str] = None,
         request_options: Optional[dict] = None,
+        client: Optional[genai.Client] = None,
+        upload_cache: Optional[ReferenceUploadCache] = None,
+        upload_concurrency: int = 4,
+        generate_concurrency: int = 16,
+        reference_preprocessor: Optional[ReferencePreprocessor] = None,
+        preprocess_references: bool = True,
     ) -> None:
         self._model_name = model_name
         self._candidate_count = candidate_count
         self._aspect_ratio = aspect_ratio
-        self._client = genai.Client(api_key=api_key)
+        # A pre-built (or fake) client can be injected for testing
+        self._client = client if client is not None else genai.Client(api_key=api_key)
+        self._upload_cache = upload_cache if upload_cache is not None else ReferenceUploadCache()
+        # Shared across calls, so this also bounds uploads from concurrent generate_images calls
+        self._upload_concurrency = max(1, upload_concurrency)
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=self._upload_concurrency, thread_name_prefix="gemini-upload"
+        )
+        self._preprocessor: Optional[ReferencePreprocessor] = None
+        if preprocess_references:
+            self._preprocessor = reference_preprocessor or ReferencePreprocessor()
+        # None until the model has accepted or rejected candidate_count > 1
+        self._multiple_candidates_supported: Optional[bool] = None
+        # Parallel single-candidate requests of all calls share this pool, so the thread count stays bounded;
+        # size it for the expected concurrent requests times their variants
+        self._generate_executor = ThreadPoolExecutor(
+            max_workers=max(1, generate_concurrency), thread_name_prefix="gemini-generate"
+        )
+        self._stats_lock = threading.Lock()
+        self._references_preprocessed = 0
+        self._reference_bytes_saved = 0
         if request_options is None:
             self._request_options: dict = {}
         elif isinstance(request_options, types.GenerateContentConfig):
@@ -50,11 +196,22 @@ class GeminiPhotographer:
         else:
             self._request_options = dict(request_options)
 
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
     def generate_images(
         self,
         prompt: str,
         reference_images: Iterable[GeminiImage],
+        candidate_count: Optional[int] = None,
     ) -> List[Image.Image]:
+        """Generate image variants for the prompt.
+
+        ``candidate_count`` overrides the instance default for this call. Models
+        without native multi-candidate support get one request per variant,
+        issued in parallel.
+        """
         if not prompt.strip():
             raise ValueError("Prompt must not be empty when requesting image generation.")
 
@@ -74,79 +231,214 @@ class GeminiPhotographer:
                     )
                 )
             )
-        for index, reference in enumerate(references, start=1):
-            reference_bytes = reference.to_bytes()
-            buffer = BytesIO(reference_bytes)
+        with stage("reference_upload", references=len(references)):
+            reference_keys, reference_parts, reused_upload = self._reference_parts(references)
+
+        config_kwargs = {key: value for key, value in dict(self._request_options).items() if value is not None}
+        config_kwargs.setdefault("response_modalities", ["IMAGE"])
+        if candidate_count is not None:
+            config_kwargs["candidate_count"] = candidate_count
+        else:
+            config_kwargs.setdefault("candidate_count", self._candidate_count)
+
+        with stage("gemini_generate", model=self._model_name, candidate_count=config_kwargs["candidate_count"]):
             try:
-                upload = self._client.files.upload(
-                    file=buffer,
-                    config=types.UploadFileConfig(
-                        display_name=f"reference-{index}",
-                        mime_type=reference.mime_type,
-                    ),
-                )
-            finally:
-                buffer.close()
+                responses = self._generate(user_parts + reference_parts, config_kwargs)
+            except errors.APIError as error:
+                if not (reused_upload and _is_stale_file_error(error)):
+                    raise
+                # A cached URI may have been deleted early on the provider side; re-upload once
+                logger.info("Reference file URI looks stale (%s); re-uploading references.", error)
+                record_provider_retry("gemini", "stale_reference")
+                for key in reference_keys:
+                    self._upload_cache.invalidate(key)
+                with stage("reference_upload", references=len(references)):
+                    _, reference_parts, _ = self._reference_parts(references)
+                responses = self._generate(user_parts + reference_parts, config_kwargs)
 
-            file_uri = upload.uri or upload.name
-            if not file_uri:
-                raise RuntimeError("Uploaded reference image is missing a file URI.")
+        images: List[Image.Image] = []
+        with stage("image_decode") as span:
+            candidates = [candidate for response in responses for candidate in response.candidates or []]
+            for candidate in candidates:
+                if candidate.content is None:
+                    continue
+                for part in candidate.content.parts:
+                    inline_data = getattr(part, "inline_data", None)
+                    if not inline_data or not inline_data.data:
+                        continue
+                    mime_type = inline_data.mime_type or "image/png"
+                    if not mime_type.startswith("image/"):
+                        continue
+                    buffer = BytesIO(inline_data.data)
+                    image = Image.open(buffer)
+                    image.load()
+                    buffer.close()
+                    images.append(image)
+            if span is not None:
+                span.set_attribute("images", len(images))
 
-            user_parts.append(
-                types.Part.from_uri(
-                    file_uri=file_uri,
-                    mime_type=upload.mime_type or reference.mime_type,
-                )
+        if not images:
+            raise RuntimeError("No images were returned by Gemini 2.5 Flash.")
+
+        return images
+
+    def _upload_reference(self, index: int, reference: GeminiImage) -> Tuple[str, CachedUpload, bool]:
+        """Upload a reference unless identical bytes were uploaded recently.
+
+        Returns the cache key, the upload and whether it came from the cache.
+        """
+        key = self._reference_key(reference)
+        cached = self._upload_cache.get(key)
+        if cached is not None:
+            return key, cached, True
+
+        if self._preprocessor is not None:
+            processed = self._preprocessor.process(data=reference.data, image=reference.image)
+            reference_bytes, mime_type = processed.data, processed.mime_type
+            with self._stats_lock:
+                self._references_preprocessed += 1
+                self._reference_bytes_saved += processed.bytes_saved
+            logger.info(
+                "Reference %d: %s -> %d bytes (saved %d)",
+                index,
+                processed.original_bytes if processed.original_bytes is not None else "?",
+                processed.optimized_bytes,
+                processed.bytes_saved,
             )
+        else:
+            reference_bytes, mime_type = reference.to_bytes(), reference.mime_type
 
-        config_kwargs = {key: value for key, value in dict(self._request_options).items() if value is not None}
-        config_kwargs.setdefault("response_modalities", ["IMAGE"])
+        # BytesIO over an immutable bytes object shares the buffer rather than copying it
+        buffer = BytesIO(reference_bytes)
+        try:
+            upload = self._client.files.upload(
+                file=buffer,
+                config=types.UploadFileConfig(
+                    display_name=f"reference-{index}",
+                    mime_type=mime_type,
+                ),
+            )
+        except Exception as error:
+            record_provider_error("gemini_files", error)
+            raise
+        finally:
+            buffer.close()
+
+        file_uri = upload.uri or upload.name
+        if not file_uri:
+            raise RuntimeError("Uploaded reference image is missing a file URI.")
+
+        expiration_time = getattr(upload, "expiration_time", None)
+        provider_expires_at = expiration_time.timestamp() if expiration_time else None
+        return key, self._upload_cache.put(
+            key, file_uri, upload.mime_type or mime_type, provider_expires_at
+        ), False
+
+    def _reference_key(self, reference: GeminiImage) -> str:
+        """Cache key from the reference content and the preprocessing settings applied to it"""
+        if reference.data is not None:
+            source, label = reference.data, reference.mime_type
+        elif reference.image is not None:
+            # Hash raw pixels so decoded references need no encoding just to look up the cache
+            source, label = reference.image.tobytes(), f"{reference.image.mode}:{reference.image.size}"
+        else:
+            raise ValueError("GeminiImage needs either encoded data or a PIL image.")
+        if self._preprocessor is not None:
+            label = f"{label}|{self._preprocessor.signature()}"
+        return ReferenceUploadCache.key_for(source, label)
+
+    def reference_stats(self) -> dict:
+        """Preprocessing and upload cache counters"""
+        with self._stats_lock:
+            return {
+                "references_preprocessed": self._references_preprocessed,
+                "reference_bytes_saved": self._reference_bytes_saved,
+                "upload_cache_hits": self._upload_cache.hits,
+                "upload_cache_misses": self._upload_cache.misses,
+                "upload_cache_entries": len(self._upload_cache),
+            }
+
+    def _reference_parts(self, references: List[GeminiImage]) -> Tuple[List[str], List[types.Part], bool]:
+        if len(references) == 1 or self._upload_concurrency == 1:
+            results = [self._upload_reference(index, reference) for index, reference in enumerate(references, start=1)]
+        else:
+            results = self._upload_references_concurrently(references)
 
+        # Results are in reference order regardless of which upload finished first
+        keys: List[str] = []
+        parts: List[types.Part] = []
+        reused = False
+        for key, upload, from_cache in results:
+            keys.append(key)
+            parts.append(types.Part.from_uri(file_uri=upload.uri, mime_type=upload.mime_type))
+            reused = reused or from_cache
+        return keys, parts, reused
+
+    def _upload_references_concurrently(
+        self, references: List[GeminiImage]
+    ) -> List[Tuple[str, CachedUpload, bool]]:
+        # Each task runs in a copy of the caller's context so its spans nest under the caller's
+        futures = [
+            self._upload_executor.submit(contextvars.copy_context().run, self._upload_reference, index, reference)
+            for index, reference in enumerate(references, start=1)
+        ]
+        _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        if not_done:
+            # One upload failed: drop the ones that have not started and let in-flight ones settle
+            for future in not_done:
+                future.cancel()
+            wait(not_done)
+            for future in futures:
+                if not future.cancelled() and future.exception() is not None:
+                    raise future.exception()
+        return [future.result() for future in futures]
+
+    def _generate(self, user_parts: List[types.Part], config_kwargs: dict) -> List[types.GenerateContentResponse]:
+        """Generate ``candidate_count`` candidates natively, or as parallel single-candidate calls"""
         def _call_generate(kwargs: dict) -> types.GenerateContentResponse:
             config = types.GenerateContentConfig(**kwargs) if kwargs else None
-            return self._client.models.generate_content(
-                model=self._model_name,
-                contents=[types.Content(role="user", parts=user_parts)],
-                config=config,
-            )
+            try:
+                return self._client.models.generate_content(
+                    model=self._model_name,
+                    contents=[types.Content(role="user", parts=user_parts)],
+                    config=config,
+                )
+            except Exception as error:
+                record_provider_error("gemini", error)
+                raise
 
-        try:
-            response = _call_generate(config_kwargs)
-        except errors.ClientError as error:
-            candidate_count = config_kwargs.get("candidate_count")
-            if (
-                candidate_count
-                and candidate_count > 1
-                and "Multiple candidates is not enabled" in str(error)
-            ):
-                fallback_kwargs = dict(config_kwargs)
-                fallback_kwargs["candidate_count"] = 1
+        candidate_count = config_kwargs.get("candidate_count") or 1
+        if candidate_count > 1 and self._multiple_candidates_supported is not False:
+            try:
+                response = _call_generate(config_kwargs)
+                self._multiple_candidates_supported = True
+                return [response]
+            except errors.ClientError as error:
+                if "Multiple candidates is not enabled" not in str(error):
+                    raise
+                # Remember, so later calls skip straight to parallel single-candidate requests
+                self._multiple_candidates_supported = False
+                record_provider_retry("gemini", "single_candidate_fallback")
                 logger.info(
-                    "Model %s does not support multiple candidates; retrying with a single image.",
+                    "Model %s does not support multiple candidates; generating %d single images in parallel.",
                     self._model_name,
+                    candidate_count,
                 )
-                response = _call_generate(fallback_kwargs)
-            else:
-                raise
 
-        images: List[Image.Image] = []
-        for candidate in response.candidates or []:
-            if candidate.content is None:
-                continue
-            for part in candidate.content.parts:
-                inline_data = getattr(part, "inline_data", None)
-                if not inline_data or not inline_data.data:
-                    continue
-                mime_type = inline_data.mime_type or "image/png"
-                if not mime_type.startswith("image/"):
-                    continue
-                buffer = BytesIO(inline_data.data)
-                image = Image.open(buffer)
-                image.load()
-                buffer.close()
-                images.append(image)
+        single_kwargs = dict(config_kwargs)
+        single_kwargs["candidate_count"] = 1
+        if candidate_count == 1:
+            return [_call_generate(single_kwargs)]
 
-        if not images:
-            raise RuntimeError("No images were returned by Gemini 2.5 Flash.")
-
-        return images
+        futures = [
+            self._generate_executor.submit(contextvars.copy_context().run, _call_generate, single_kwargs)
+            for _ in range(candidate_count)
+        ]
+        wait(futures)
+        responses = [future.result() for future in futures if future.exception() is None]
+        if not responses:
+            # Every variant failed; surface the first error
+            raise futures[0].exception()
+        if len(responses) < candidate_count:
+            logger.warning("Only %d of %d image variants were generated.", len(responses), candidate_count)
+        return responses
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+try:
+    from pillow_heif import register_heif_opener
+
+    register_heif_opener()
+except ImportError:  # pragma: no cover - optional dependency
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+@dataclass
+class PreprocessedReference:
+    data: bytes
+    mime_type: str
+    # Size of the encoded input, or None when the reference was only a decoded PIL image
+    original_bytes: Optional[int]
+    width: int
+    height: int
+
+    @property
+    def optimized_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def bytes_saved(self) -> int:
+        if self.original_bytes is None:
+            return 0
+        return self.original_bytes - self.optimized_bytes
+
+
+@dataclass
+class ReferencePreprocessor:
+    """Downscale and re-encode reference images before upload.
+
+    Images are rotated according to their EXIF orientation, resized so the
+    longest edge is at most ``max_edge`` and re-encoded without EXIF as
+    ``output_format`` (images with transparency always use WebP). Inputs that
+    are already small, metadata-free JPEG/WebP files are passed through.
+    """
+
+    max_edge: int = 2048
+    output_format: str = "JPEG"
+    quality: int = 90
+
+    def __post_init__(self) -> None:
+        self.output_format = self.output_format.upper()
+        if self.output_format not in OUTPUT_MIME_TYPES:
+            raise ValueError(f"Unsupported reference output format '{self.output_format}'.")
+
+    def signature(self) -> str:
+        """Identifies the settings, so cached uploads are not shared across configurations"""
+        return f"{self.max_edge}:{self.output_format}:{self.quality}"
+
+    def process(self, data: Optional[bytes] = None, image: Optional[Image.Image] = None) -> PreprocessedReference:
+        if data is not None:
+            with Image.open(BytesIO(data)) as source:
+                return self._process_image(source, data)
+        if image is None:
+            raise ValueError("Reference preprocessing needs either encoded data or a PIL image.")
+        return self._process_image(image, None)
+
+    def _process_image(self, source: Image.Image, data: Optional[bytes]) -> PreprocessedReference:
+        source_format = (source.format or "").upper()
+        exif = source.getexif()
+        needs_resize = max(source.size) > self.max_edge
+
+        if data is not None and not needs_resize and not exif and source_format in OUTPUT_MIME_TYPES:
+            return PreprocessedReference(
+                data=data,
+                mime_type=OUTPUT_MIME_TYPES[source_format],
+                original_bytes=len(data),
+                width=source.width,
+                height=source.height,
+            )
+
+        # Bake the orientation into the pixels; the EXIF block itself is dropped on save
+        image = ImageOps.exif_transpose(source) if exif.get(_EXIF_ORIENTATION_TAG, 1) != 1 else source
+        if needs_resize:
+            image = image.copy() if image is source else image
+            image.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in {"RGBA", "LA", "PA"} or (image.mode == "P" and "transparency" in image.info)
+        output_format = "WEBP" if has_alpha else self.output_format
+        if output_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        save_kwargs = {"format": output_format, "quality": self.quality}
+        if output_format == "JPEG":
+            save_kwargs.update(optimize=True, progressive=True)
+        icc_profile = source.info.get("icc_profile")
+        if icc_profile:
+            save_kwargs["icc_profile"] = icc_profile
+
+        buffer = BytesIO()
+        try:
+            image.save(buffer, **save_kwargs)
+            encoded = buffer.getvalue()
+        finally:
+            buffer.close()
+
+        result = PreprocessedReference(
+            data=encoded,
+            mime_type=OUTPUT_MIME_TYPES[output_format],
+            original_bytes=len(data) if data is not None else None,
+            width=image.width,
+            height=image.height,
+        )
+        logger.info(
+            "Preprocessed reference %sx%s %s -> %sx%s %s: %s -> %d bytes",
+            source.width,
+            source.height,
+            source_format or "image",
+            result.width,
+            result.height,
+            output_format,
+            result.original_bytes if result.original_bytes is not None else "?",
+            result.optimized_bytes,
+        )
+        return result
@@ -7,7 +7,6 @@ from pathlib import Path
 from typing import List, Optional
 
 from dotenv import load_dotenv
-from PIL import Image
 
 try:
     from pillow_heif import register_heif_opener
@@ -53,18 +52,8 @@ def load_reference_images(paths: List[str]) -> List[GeminiImage]:
                 "HEIC/HEIF support not available. Install pillow-heif (pip install pillow-heif) to load these files."
             )
 
-        with Image.open(path) as img:
-            image_copy = img.convert("RGB") if img.mode not in {"RGB", "RGBA"} else img.copy()
-            fmt = (img.format or "PNG").upper()
-
-        if fmt in {"JPG", "JPEG"}:
-            mime = "image/jpeg"
-        elif fmt in {"HEIF", "HEIC"}:
-            mime = "image/png"
-        else:
-            mime = "image/png"
-
-        references.append(GeminiImage(image=image_copy, mime_type=mime))
+        # The photographer downscales and re-encodes references (including HEIC) before upload
+        references.append(GeminiImage.from_path(str(path)))
 
     return references
 
@@ -4,8 +4,11 @@ Writer agents package for the marketing agent system.
 This package contains specialized agents for content creation and management.
 """
 
-from .writer import WriterAgent
+from .writer import WriterAgent, WriterError
+from .agent_pool import WriterAgentPool
 
 __all__ = [
-    "WriterAgent"
+    "WriterAgent",
+    "WriterError",
+    "WriterAgentPool",
 ]
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Pool of WriterAgents for serving many conversations from one process.
+
+A Strands ``Agent`` keeps the conversation in ``agent.messages`` and cannot
+run two requests at once, so a single shared agent serializes every caller
+and mixes their histories. The pool gives each session its own agent, built
+by a factory that reuses one model client, and keeps at most
+``max_sessions`` idle sessions (least recently used are evicted). Requests
+without a session get a pre-warmed agent whose history is cleared when it
+is returned. At most ``max_concurrency`` requests run at the same time.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from agents.writer.writer import WriterAgent
+
+
+class _Session:
+    def __init__(self, agent: WriterAgent):
+        self.agent = agent
+        # Requests of the same session take turns on its agent
+        self.lock = threading.Lock()
+        # Requests holding or waiting for the lock; sessions in use are never evicted
+        self.users = 0
+
+
+class _Lease:
+    def __init__(self, agent: WriterAgent, session_id: Optional[str], session: Optional[_Session]):
+        self.agent = agent
+        self.session_id = session_id
+        self.session = session
+
+
+class WriterAgentPool:
+    def __init__(
+        self,
+        factory: Callable[[], WriterAgent],
+        max_sessions: int = 64,
+        max_concurrency: int = 8,
+        prewarm: int = 2,
+    ):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        # Agents for requests without a session, ready to use
+        self._idle: List[WriterAgent] = [factory() for _ in range(prewarm)]
+        self._max_idle = max(prewarm, 1)
+        self._in_flight = 0
+        self._created = prewarm
+        self._evicted = 0
+
+    def checkout(self, session_id: Optional[str] = None) -> _Lease:
+        """Wait for the session's agent and a free slot. Blocking; pair with ``checkin``."""
+        session = None
+        locked = False
+        slotted = False
+        try:
+            if session_id:
+                with self._lock:
+                    session = self._sessions.get(session_id)
+                    if session is None:
+                        session = _Session(None)
+                        self._sessions[session_id] = session
+                    self._sessions.move_to_end(session_id)
+                    session.users += 1
+                    self._evict()
+                # The session's turn comes before the slot, so requests queued behind a busy
+                # session do not hold slots other sessions could use
+                session.lock.acquire()
+                locked = True
+            self._slots.acquire()
+            slotted = True
+            if session is None:
+                with self._lock:
+                    agent = self._idle.pop() if self._idle else None
+                if agent is None:
+                    agent = self._new_agent()
+            else:
+                # Built outside the pool lock; only this request can see the new session's agent yet
+                if session.agent is None:
+                    session.agent = self._new_agent()
+                agent = session.agent
+        except BaseException:
+            if session is not None:
+                self._release_session(session, locked)
+            if slotted:
+                self._slots.release()
+            raise
+        with self._lock:
+            self._in_flight += 1
+        return _Lease(agent, session_id, session)
+
+    def checkin(self, lease: _Lease):
+        if lease.session is None:
+            # Nothing of this conversation may leak into the next anonymous request
+            lease.agent.agent.messages = []
+            with self._lock:
+                if len(self._idle) < self._max_idle:
+                    self._idle.append(lease.agent)
+        else:
+            self._release_session(lease.session, locked=True)
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def lease(self, session_id: Optional[str] = None) -> Iterator[WriterAgent]:
+        lease = self.checkout(session_id)
+        try:
+            yield lease.agent
+        finally:
+            self.checkin(lease)
+
+    async def stream(self, session_id: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """``WriterAgent.stream`` on the session's agent, holding it until the stream ends"""
+        loop = asyncio.get_running_loop()
+        # Waiting for a slot blocks, so do it off the event loop
+        pending = loop.run_in_executor(None, self.checkout, session_id)
+        try:
+            lease = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # The checkout still completes in its thread; hand the agent back once it does
+            def release(done):
+                if done.exception() is None:
+                    self.checkin(done.result())
+
+            pending.add_done_callback(release)
+            raise
+        try:
+            async for chunk in lease.agent.stream(**kwargs):
+                yield chunk
+        finally:
+            self.checkin(lease)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_agents": len(self._idle),
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "agents_created": self._created,
+                "sessions_evicted": self._evicted,
+            }
+
+    def _new_agent(self) -> WriterAgent:
+        agent = self.factory()
+        with self._lock:
+            self._created += 1
+        return agent
+
+    def _release_session(self, session: _Session, locked: bool):
+        if locked:
+            session.lock.release()
+        with self._lock:
+            session.users -= 1
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used sessions beyond ``max_sessions``. Caller holds ``self._lock``."""
+        excess = len(self._sessions) - self.max_sessions
+        if excess <= 0:
+            return
+        for session_id in [session_id for session_id, session in self._sessions.items() if session.users == 0][:excess]:
+            del self._sessions[session_id]
+            self._evicted += 1
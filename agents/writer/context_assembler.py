@@ -0,0 +1,194 @@
+"""
+Token-budgeted assembly of the context MemoryHook gives the writer agent.
+
+Two kinds of context are assembled: the conversation history loaded when an
+agent starts, and the long-term memories (preferences, facts) appended to
+each user message. Both are deduplicated and trimmed to a token budget,
+keeping the most recent turns and the most relevant memories. Token counts
+are estimated from text length; no tokenizer is needed.
+"""
+
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+
+from utils.telemetry import record_context_assembly
+
+logger = logging.getLogger(__name__)
+
+# Strands message: {"role": "user" | "assistant", "content": [{"text": ...}]}
+Message = Dict[str, Any]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so near-identical texts compare equal"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def _message_text(message: Message) -> str:
+    return "".join(block.get("text", "") for block in message.get("content", []))
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return 0.0
+
+
+@dataclass
+class AssemblyReport:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    duplicates_dropped: int = 0
+    # Turns or memories left out to stay within the budget
+    over_budget_dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class ContextAssembler:
+    def __init__(self, history_token_budget: int = 2000, memory_token_budget: int = 400):
+        self.history_token_budget = history_token_budget
+        self.memory_token_budget = memory_token_budget
+        self._lock = threading.Lock()
+        self._totals = {"assemblies": 0, "tokens_before": 0, "tokens_after": 0, "duplicates_dropped": 0, "over_budget_dropped": 0}
+
+    @classmethod
+    def from_env(cls) -> "ContextAssembler":
+        return cls(
+            history_token_budget=int(os.getenv("MEMORY_HISTORY_TOKEN_BUDGET", "2000")),
+            memory_token_budget=int(os.getenv("MEMORY_CONTEXT_TOKEN_BUDGET", "400")),
+        )
+
+    def assemble_history(self, turns: Sequence[Sequence[Message]]) -> Tuple[List[Message], AssemblyReport]:
+        """Flatten chronological turns into messages within the history budget.
+
+        Whole turns are kept newest first up to the first one that does not
+        fit, so the history is a contiguous recent stretch, never starts
+        mid-turn and roles keep alternating. A turn asking the same thing as a
+        newer one is dropped.
+        """
+        report = AssemblyReport()
+        seen = set()
+        kept_turns: List[List[Message]] = []
+        used = 0
+        over_budget = False
+        for turn in reversed(turns):
+            turn_tokens = sum(estimate_tokens(_message_text(message)) for message in turn)
+            report.tokens_before += turn_tokens
+            if over_budget:
+                # Older than a turn that did not fit; keeping it would leave a gap in the history
+                if turn:
+                    report.over_budget_dropped += 1
+                continue
+            if not turn:
+                continue
+            key = normalize_text(" ".join(_message_text(message) for message in turn if message["role"] == "user"))
+            if key and key in seen:
+                report.duplicates_dropped += 1
+                continue
+            seen.add(key)
+            if used + turn_tokens > self.history_token_budget:
+                report.over_budget_dropped += 1
+                over_budget = True
+                continue
+            used += turn_tokens
+            kept_turns.append(list(turn))
+
+        history = [message for turn in reversed(kept_turns) for message in turn]
+        # Bedrock conversations must open with a user message
+        while history and history[0]["role"] != "user":
+            history.pop(0)
+        report.tokens_after = sum(estimate_tokens(_message_text(message)) for message in history)
+        self._record("history", report)
+        return history, report
+
+    def assemble_memories(self, sections: Sequence[Tuple[str, List[Dict[str, Any]]]]) -> Tuple[str, AssemblyReport]:
+        """Render retrieved memories as text appended to a user message, within the memory budget.
+
+        ``sections`` pairs a heading (e.g. "These are user preferences:") with
+        the memory records retrieved for it. Records are deduplicated across
+        sections and picked by relevance score, then recency; of near-identical
+        records the best-ranked copy is kept.
+        """
+        report = AssemblyReport()
+        # Per normalized text, the best-ranked copy: (-score, -createdAt, section, text)
+        best: Dict[str, Tuple[float, float, int, str]] = {}
+        for section_index, (_, memories) in enumerate(sections):
+            for memory in memories:
+                text = memory["content"]["text"].strip()
+                report.tokens_before += estimate_tokens(text)
+                key = normalize_text(text)
+                if not key:
+                    report.duplicates_dropped += 1
+                    continue
+                score = memory.get("score")
+                candidate = (
+                    -(score if isinstance(score, (int, float)) else 0.0),
+                    -_timestamp(memory.get("createdAt")),
+                    section_index,
+                    text,
+                )
+                if key in best:
+                    report.duplicates_dropped += 1
+                    if candidate[:2] >= best[key][:2]:
+                        continue
+                best[key] = candidate
+
+        chosen: Dict[int, List[str]] = {}
+        used = 0
+        for _, _, section_index, text in sorted(best.values(), key=lambda candidate: candidate[:2]):
+            tokens = estimate_tokens(text)
+            # The heading counts against the budget once its section has content
+            if section_index not in chosen:
+                tokens += estimate_tokens(sections[section_index][0])
+            if used + tokens > self.memory_token_budget:
+                report.over_budget_dropped += 1
+                continue
+            used += tokens
+            chosen.setdefault(section_index, []).append(text)
+
+        blocks = [
+            f"\n\n{sections[section_index][0]}\n\n" + "\n".join(chosen[section_index]) + "\n\n"
+            for section_index in sorted(chosen)
+        ]
+        report.tokens_after = sum(estimate_tokens(text) for texts in chosen.values() for text in texts)
+        self._record("memories", report)
+        return "".join(blocks), report
+
+    def _record(self, context: str, report: AssemblyReport):
+        record_context_assembly(
+            context, report.tokens_before, report.tokens_after, report.duplicates_dropped, report.over_budget_dropped
+        )
+        with self._lock:
+            self._totals["assemblies"] += 1
+            self._totals["tokens_before"] += report.tokens_before
+            self._totals["tokens_after"] += report.tokens_after
+            self._totals["duplicates_dropped"] += report.duplicates_dropped
+            self._totals["over_budget_dropped"] += report.over_budget_dropped
+        if report.tokens_saved > 0:
+            logger.info(
+                "Context assembly saved ~%d tokens (%d duplicates, %d over budget)",
+                report.tokens_saved,
+                report.duplicates_dropped,
+                report.over_budget_dropped,
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            totals = dict(self._totals)
+        totals["tokens_saved"] = totals["tokens_before"] - totals["tokens_after"]
+        return totals
@@ -0,0 +1,72 @@
+"""
+Conversation history limits for WriterAgent.
+
+``TokenWindowConversationManager`` is a Strands conversation manager that,
+after every invocation, drops the oldest turns until the history carried
+into the next call fits a token budget. Trimming always starts the history
+at a user prompt, so tool use / tool result pairs stay together.
+"""
+
+import json
+import logging
+from typing import Any, Dict
+
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+
+from agents.writer.context_assembler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """Estimated tokens of one Strands message, including tool inputs and results"""
+    total = 0
+    for block in message.get("content", []):
+        if "text" in block:
+            total += estimate_tokens(block["text"])
+        else:
+            total += estimate_tokens(json.dumps(block, default=str))
+    return total
+
+
+def _starts_turn(message: Dict[str, Any]) -> bool:
+    # A user message carrying tool results continues the previous turn
+    return message["role"] == "user" and not any("toolResult" in block for block in message.get("content", []))
+
+
+class TokenWindowConversationManager(SlidingWindowConversationManager):
+    def __init__(self, max_history_tokens: int = 4000, window_size: int = 40):
+        super().__init__(window_size=window_size)
+        self.max_history_tokens = max_history_tokens
+
+    def apply_management(self, agent, **kwargs: Any) -> None:
+        """Trim whole turns from the front until the history fits ``max_history_tokens`` and ``window_size``"""
+        messages = agent.messages
+        tokens = [message_tokens(message) for message in messages]
+        remaining = sum(tokens)
+        trim_index = 0
+        # The newest turn is never trimmed, even if it alone exceeds the budget
+        last_turn = max((index for index, message in enumerate(messages) if _starts_turn(message)), default=0)
+        while trim_index < last_turn and (
+            remaining > self.max_history_tokens or len(messages) - trim_index > self.window_size
+        ):
+            remaining -= tokens[trim_index]
+            trim_index += 1
+            while trim_index < last_turn and not _starts_turn(messages[trim_index]):
+                remaining -= tokens[trim_index]
+                trim_index += 1
+        if trim_index:
+            logger.debug("Trimmed %d messages from the writer history, ~%d tokens kept", trim_index, remaining)
+            self.removed_message_count += trim_index
+            messages[:] = messages[trim_index:]
+
+    def reduce_context(self, agent, e=None, **kwargs: Any) -> None:
+        """Called when the model rejects the context as too long: drop the oldest turn"""
+        messages = agent.messages
+        next_turn = next((index for index in range(1, len(messages)) if _starts_turn(messages[index])), None)
+        if next_turn is None:
+            # Only the current turn is left; fall back to truncating its tool results
+            super().reduce_context(agent, e=e, **kwargs)
+            return
+        self.removed_message_count += next_turn
+        messages[:] = messages[next_turn:]
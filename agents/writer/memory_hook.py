@@ -1,7 +1,245 @@
 from bedrock_agentcore.memory import MemoryClient
 from strands.hooks.events import AgentInitializedEvent, MessageAddedEvent
 from strands.hooks.registry import HookProvider, HookRegistry
-import copy
+from agents.writer.context_assembler import ContextAssembler, normalize_text
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+# (memory_id, actor_id, session_id)
+SessionKey = Tuple[str, str, str]
+
+_STOP = object()
+
+
+class _FlushRequest:
+    def __init__(self, key: Optional[SessionKey] = None):
+        # None flushes every session
+        self.key = key
+        self.done = threading.Event()
+
+
+class MemoryWriter:
+    """Persists conversation messages to AgentCore Memory from a background thread.
+
+    Messages go onto a bounded queue and are written per session in batches,
+    one ``save_conversation`` event per batch, once a session has
+    ``max_batch_messages`` pending or its oldest pending message is
+    ``flush_interval_seconds`` old. Everything pending is written on
+    ``flush()`` and ``close()`` (also run at interpreter exit); ``flush(key)``
+    writes a single session. When the queue
+    is full new messages are dropped and counted rather than blocking the
+    caller.
+    """
+
+    def __init__(
+        self,
+        memory_client: MemoryClient,
+        max_queue_size: int = 1000,
+        max_batch_messages: int = 10,
+        flush_interval_seconds: float = 2.0,
+    ):
+        self.memory_client = memory_client
+        self.max_batch_messages = max_batch_messages
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._dropped = 0
+        self._batches_written = 0
+        self._messages_written = 0
+        self._failed_batches = 0
+        # Messages per session that are queued or pending but not written yet
+        self._unwritten: Dict[SessionKey, int] = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, memory_id: str, actor_id: str, session_id: str, text: str, role: str) -> bool:
+        """Queue one message without blocking. Returns False if it was dropped because the queue is full."""
+        key = (memory_id, actor_id, session_id)
+        with self._stats_lock:
+            self._unwritten[key] = self._unwritten.get(key, 0) + 1
+        try:
+            self._queue.put_nowait((key, text, role, time.time()))
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._written(key, 1)
+                self._dropped += 1
+                dropped = self._dropped
+            # Report the first drop and then every hundredth so a stuck backend does not flood the logs
+            if dropped == 1 or dropped % 100 == 0:
+                print(f"Memory backpressure: queue full ({self._queue.maxsize}), {dropped} messages dropped so far")
+            return False
+
+    def flush(self, key: Optional[SessionKey] = None, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far, or only session ``key``'s messages.
+
+        Returns False if that did not finish within ``timeout``.
+        """
+        if self._closed:
+            return True
+        if key is not None:
+            with self._stats_lock:
+                if not self._unwritten.get(key):
+                    return True
+        request = _FlushRequest(key)
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Flush pending messages and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print("Memory writer: queue still full on shutdown, pending messages may be lost")
+            return
+        self._thread.join(timeout)
+
+    def _written(self, key: SessionKey, count: int):
+        # Caller holds _stats_lock
+        remaining = self._unwritten.get(key, 0) - count
+        if remaining > 0:
+            self._unwritten[key] = remaining
+        else:
+            self._unwritten.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "dropped": self._dropped,
+                "batches_written": self._batches_written,
+                "messages_written": self._messages_written,
+                "failed_batches": self._failed_batches,
+            }
+
+    def _run(self):
+        # Per session: pending (text, role) messages and the enqueue time of the oldest one
+        pending: "OrderedDict[SessionKey, List[Tuple[str, str]]]" = OrderedDict()
+        oldest: Dict[SessionKey, float] = {}
+
+        def write(key: SessionKey):
+            messages = pending.pop(key)
+            first_at = oldest.pop(key)
+            memory_id, actor_id, session_id = key
+            try:
+                self.memory_client.save_conversation(
+                    memory_id=memory_id,
+                    actor_id=actor_id,
+                    session_id=session_id,
+                    messages=messages,
+                    event_timestamp=datetime.fromtimestamp(first_at, tz=timezone.utc),
+                )
+                with self._stats_lock:
+                    self._batches_written += 1
+                    self._messages_written += len(messages)
+            except Exception as e:
+                with self._stats_lock:
+                    self._failed_batches += 1
+                print(f"Memory save error: {e}")
+            finally:
+                with self._stats_lock:
+                    self._written(key, len(messages))
+
+        while True:
+            timeout = None
+            if oldest:
+                timeout = max(0.0, min(oldest.values()) + self.flush_interval_seconds - time.time())
+            try:
+                items = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            # Take everything already waiting, so messages that queued up during a slow write share a batch
+            while items and items[-1] is not _STOP and not isinstance(items[-1], _FlushRequest):
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in items:
+                if item is _STOP or isinstance(item, _FlushRequest):
+                    flush_key = item.key if isinstance(item, _FlushRequest) else None
+                    for key in list(pending):
+                        if flush_key is None or key == flush_key:
+                            write(key)
+                    if item is _STOP:
+                        return
+                    item.done.set()
+                    continue
+                key, text, role, enqueued_at = item
+                pending.setdefault(key, []).append((text, role))
+                oldest.setdefault(key, enqueued_at)
+                if len(pending[key]) >= self.max_batch_messages:
+                    write(key)
+
+            now = time.time()
+            for key in [key for key, first_at in oldest.items() if now - first_at >= self.flush_interval_seconds]:
+                write(key)
+
+
+class RetrievalCache:
+    """Short-lived LRU of long-term memory retrievals, keyed by actor, namespace and normalized query"""
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, actor_id: str, namespace: str, query: str) -> Optional[List[Dict[str, Any]]]:
+        key = (actor_id, namespace, normalize_text(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, actor_id: str, namespace: str, query: str, memories: List[Dict[str, Any]]):
+        key = (actor_id, namespace, normalize_text(query))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, memories)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by all hooks; each user message needs two lookups at most
+_retrieval_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="memory-retrieve")
+
+# One writer (and thread) per memory client, shared by every hook that is not given its own
+_shared_writers: Dict[int, MemoryWriter] = {}
+_shared_writers_lock = threading.Lock()
+
+
+def shared_writer(memory_client: MemoryClient) -> MemoryWriter:
+    """The process-wide MemoryWriter for ``memory_client``, created on first use"""
+    with _shared_writers_lock:
+        writer = _shared_writers.get(id(memory_client))
+        if writer is None:
+            writer = _shared_writers[id(memory_client)] = MemoryWriter(memory_client)
+        return writer
 
 
 class MemoryHook(HookProvider):
@@ -11,15 +249,33 @@ class MemoryHook(HookProvider):
         memory_id: str,
         actor_id: str,
         session_id: str,
+        writer: Optional[MemoryWriter] = None,
+        retrieval_cache: Optional[RetrievalCache] = None,
+        context_assembler: Optional[ContextAssembler] = None,
+        flush_timeout_seconds: Optional[float] = None,
     ):
         self.memory_client = memory_client
         self.memory_id = memory_id
         self.actor_id = actor_id
         self.session_id = session_id
+        # Hooks for many sessions share one writer (and its thread) unless given their own
+        self.writer = writer or shared_writer(memory_client)
+        self.retrieval_cache = retrieval_cache or RetrievalCache()
+        # Keeps loaded history and retrieved memories within a token budget
+        self.context_assembler = context_assembler or ContextAssembler.from_env()
+        # Longest agent start waits for this session's queued messages before loading history
+        if flush_timeout_seconds is None:
+            flush_timeout_seconds = float(os.getenv("MEMORY_FLUSH_TIMEOUT_SECONDS", "0.5"))
+        self.flush_timeout_seconds = flush_timeout_seconds
 
     def on_agent_initialized(self, event: AgentInitializedEvent):
         """Load recent conversation history when agent starts"""
         try:
+            # Messages of this session may still be queued; write them so they are part of the history.
+            # Returns at once when nothing of this session is pending; other sessions are left to the
+            # writer's own schedule. On timeout the history is loaded without the newest messages
+            if not self.writer.flush(self._session_key, timeout=self.flush_timeout_seconds):
+                print(f"Memory flush timed out after {self.flush_timeout_seconds}s, loading history without it")
             # Load the last 5 conversation turns from memory
             recent_turns = self.memory_client.get_last_k_turns(
                 memory_id=self.memory_id,
@@ -30,14 +286,17 @@ class MemoryHook(HookProvider):
 
             if recent_turns:
                 # Format conversation history for context
-                context_messages = []
+                context_turns = []
                 for turn in recent_turns:
+                    context_turn = []
                     for message in turn:
                         role = "assistant" if message["role"] == "ASSISTANT" else "user"
                         content = message["content"]["text"]
-                        context_messages.append(
+                        context_turn.append(
                             {"role": role, "content": [{"text": content}]}
                         )
+                    context_turns.append(context_turn)
+                context_messages, _ = self.context_assembler.assemble_history(context_turns)
 
                 # context = "\n".join(context_messages)
                 # Add context to agent's system prompt.
@@ -51,57 +310,66 @@ class MemoryHook(HookProvider):
         except Exception as e:
             print(f"Memory load error: {e}")
 
-    def _add_context_user_query(
-        self, namespace: str, query: str, init_content: str, event: MessageAddedEvent
-    ):
-        content = None
-        memories = self.memory_client.retrieve_memories(
-            memory_id=self.memory_id, namespace=namespace, query=query, top_k=3
-        )
-
-        for memory in memories:
-            if not content:
-                content = "\n\n" + init_content + "\n\n"
+    def _retrieve(self, namespace: str, query: str) -> List[Dict[str, Any]]:
+        memories = self.retrieval_cache.get(self.actor_id, namespace, query)
+        if memories is None:
+            memories = self.memory_client.retrieve_memories(
+                memory_id=self.memory_id, namespace=namespace, query=query, top_k=3
+            )
+            self.retrieval_cache.put(self.actor_id, namespace, query, memories)
+        return memories
 
-            content += memory["content"]["text"]
+    def _add_context_user_query(self, query: str, event: MessageAddedEvent):
+        """Append the user's preferences and facts relevant to the query to the new message.
 
-            if content:
-                event.agent.messages[-1]["content"][0]["text"] += content + "\n\n"
+        Both namespaces are looked up at the same time.
+        """
+        lookups = [
+            (f"support/user/{self.actor_id}/preferences", "These are user preferences:"),
+            (f"support/user/{self.actor_id}/facts", "These are user facts:"),
+        ]
+        futures = [
+            _retrieval_executor.submit(self._retrieve, namespace, query) for namespace, _ in lookups
+        ]
+        sections = [(init_content, future.result()) for (_, init_content), future in zip(lookups, futures)]
+        context, _ = self.context_assembler.assemble_memories(sections)
+        if context:
+            event.message["content"][0]["text"] += context
 
     def on_message_added(self, event: MessageAddedEvent):
         """Store messages in memory"""
-        messages = copy.deepcopy(event.agent.messages)
+        # Only the newest message matters; read it from the event instead of copying the whole history
+        message = event.message
         try:
-            if messages[-1]["role"] == "user" or messages[-1]["role"] == "assistant":
-                if "text" not in messages[-1]["content"][0]:
+            if message["role"] == "user" or message["role"] == "assistant":
+                content = message["content"]
+                if not content or "text" not in content[0]:
                     return
 
-                if messages[-1]["role"] == "user":
-                    self._add_context_user_query(
-                        namespace=f"support/user/{self.actor_id}/preferences",
-                        query=messages[-1]["content"][0]["text"],
-                        init_content="These are user preferences:",
-                        event=event,
-                    )
-
-                    self._add_context_user_query(
-                        namespace=f"support/user/{self.actor_id}/facts",
-                        query=messages[-1]["content"][0]["text"],
-                        init_content="These are user facts:",
-                        event=event,
-                    )
-                self.memory_client.save_conversation(
-                    memory_id=self.memory_id,
-                    actor_id=self.actor_id,
-                    session_id=self.session_id,
-                    messages=[
-                        (messages[-1]["content"][0]["text"], messages[-1]["role"])
-                    ],
+                # Strings are immutable, so this keeps the original text even after context is appended below
+                text = content[0]["text"]
+                if message["role"] == "user":
+                    self._add_context_user_query(text, event)
+                # Persisted in the background; the agent loop never waits on AgentCore Memory
+                self.writer.enqueue(
+                    self.memory_id,
+                    self.actor_id,
+                    self.session_id,
+                    text,
+                    message["role"],
                 )
 
         except Exception as e:
             raise RuntimeError(f"Memory save error: {e}")
 
+    @property
+    def _session_key(self) -> SessionKey:
+        return (self.memory_id, self.actor_id, self.session_id)
+
+    def close(self):
+        """Write this session's queued messages; the writer itself keeps running for other hooks"""
+        self.writer.flush(self._session_key)
+
     def register_hooks(self, registry: HookRegistry):
         registry.add_callback(MessageAddedEvent, self.on_message_added)
         registry.add_callback(AgentInitializedEvent, self.on_agent_initialized)
@@ -1,15 +1,70 @@
+from botocore.exceptions import ClientError
 from strands import Agent, tool
+from strands.agent.conversation_manager import NullConversationManager
+from strands.event_loop.streaming import extract_usage_metrics
+from strands.models import Model
 from strands.models.bedrock import BedrockModel
 from strands_tools import calculator, current_time
+from agents.writer.history import TokenWindowConversationManager
 from prompts.InputPrompt import InputPrompt
-from typing import List, Optional
+from prompts.platforms import PLATFORM_GUIDELINES
+from pydantic import Field, create_model
+from utils.telemetry import record_model_tokens, record_prompt_cache
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import os
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
 load_dotenv()
 
 
+def build_bedrock_model(model_id: str, region_name: str, prompt_caching: Optional[bool] = None) -> BedrockModel:
+    """Strands BedrockModel that marks the system prompt and tool specs as a cacheable prefix.
+
+    The prefix is identical for every call, so with Bedrock prompt caching it
+    is read from the cache instead of being processed again. Bedrock only
+    caches a prefix above the model's minimum length (e.g. 1024 tokens for
+    Claude 3.7 Sonnet); shorter prefixes are simply not cached.
+    """
+    if prompt_caching is None:
+        prompt_caching = os.getenv("WRITER_PROMPT_CACHING", "true").lower() in {"1", "true", "yes"}
+    cache_points = {"cache_prompt": "default", "cache_tools": "default"} if prompt_caching else {}
+    return BedrockModel(model_id=model_id, region_name=region_name, **cache_points)
+
+
+class WriterError(RuntimeError):
+    """The writer could not produce content; raised instead of returning error text that looks like a caption"""
+
+
+def _caching_unsupported(error: Exception) -> bool:
+    """Bedrock rejects cache points with a ValidationException on models without prompt caching"""
+    return (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") == "ValidationException"
+        and "cach" in str(error).lower()
+    )
+
+
+def analyze_content(text: str) -> Dict[str, int]:
+    """Readability and engagement figures of a text, as computed by the content_analyzer tool"""
+    return {
+        "words": len(text.split()),
+        "characters": len(text),
+        # Simple engagement score based on question marks and exclamation points
+        "engagement_score": text.count('?') + text.count('!'),
+    }
+
+
+def suggest_hashtags(topic: str, count: int = 5) -> List[str]:
+    """Hashtags for a topic, as produced by the generate_hashtags tool"""
+    # Simple hashtag generation (in a real app, this would be more sophisticated)
+    base_hashtags = [f"#{topic.replace(' ', '')}", f"#{topic.replace(' ', '').lower()}"]
+    additional = [f"#{topic.replace(' ', '')}{i}" for i in range(1, count-1)]
+    return base_hashtags + additional[:count-2]
+
+
 # Define a custom tool for content analysis
 @tool
 def content_analyzer(text: str, analysis_type: str = "readability") -> str:
@@ -23,14 +78,11 @@ def content_analyzer(text: str, analysis_type: str = "readability") -> str:
     Returns:
         str: Analysis results
     """
+    analysis = analyze_content(text)
     if analysis_type == "readability":
-        word_count = len(text.split())
-        char_count = len(text)
-        return f"Content Analysis: {word_count} words, {char_count} characters"
+        return f"Content Analysis: {analysis['words']} words, {analysis['characters']} characters"
     elif analysis_type == "engagement":
-        # Simple engagement score based on question marks and exclamation points
-        engagement_score = text.count('?') + text.count('!')
-        return f"Engagement Score: {engagement_score} (based on questions and exclamations)"
+        return f"Engagement Score: {analysis['engagement_score']} (based on questions and exclamations)"
     else:
         return f"Analysis type '{analysis_type}' not supported"
 
@@ -48,10 +100,15 @@ def generate_hashtags(topic: str, count: int = 5) -> str:
     Returns:
         str: Comma-separated list of hashtags
     """
-    # Simple hashtag generation (in a real app, this would be more sophisticated)
-    base_hashtags = [f"#{topic.replace(' ', '')}", f"#{topic.replace(' ', '').lower()}"]
-    additional = [f"#{topic.replace(' ', '')}{i}" for i in range(1, count-1)]
-    return ", ".join(base_hashtags + additional[:count-2])
+    return ", ".join(suggest_hashtags(topic, count))
+
+
+# Deterministic tools WriterAgent runs itself around each call instead of leaving them to the model;
+# exposing them costs a model round trip per use for output the agent can compute up front
+LOCAL_TOOLS = {"content_analyzer", "generate_hashtags"}
+
+# The product name line of a free-form query, as written by the backend's caption prompt
+_PRODUCT_NAME_LINE = re.compile(r"^[ \t]*Product Name:[ \t]*(\S.*?)[ \t]*$", re.MULTILINE)
 
 
 class WriterAgent:
@@ -65,6 +122,11 @@ class WriterAgent:
         bedrock_model_id: str = "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
         aws_region: str = None,
         temperature: float = 0.7,
+        model: Optional[Model] = None,
+        prompt_caching: Optional[bool] = None,
+        stateless: Optional[bool] = None,
+        max_history_tokens: Optional[int] = None,
+        exposed_tools: Optional[Iterable[str]] = None,
     ):
         self.system_prompt = (
             system_prompt
@@ -72,11 +134,13 @@ class WriterAgent:
             else """
     You are a professional social media content writer specializing in creating engaging, viral-worthy posts across all platforms.
     
-    You have access to tools to help you create high-quality marketing content:
+    You may have access to tools to help you create high-quality marketing content:
     - Calculator: for any calculations needed
     - Current time: to reference timing in posts
     - Content analyzer: to analyze your content
     - Hashtag generator: to create relevant hashtags
+    Only call tools that are available to you. When suggested hashtags come with the request, use them
+    instead of generating new ones.
     
     You will ALWAYS follow these guidelines when creating content:
     - Create content that is engaging, informative, and aligned with the brand voice
@@ -91,30 +155,171 @@ class WriterAgent:
     - Use emojis and line breaks for visual appeal instead of markdown formatting
     """
         )
-        # Decide which LLM provider to use
+        # Decide which LLM provider to use; an explicit model (e.g. a shared or stub one) skips provider setup
         provider = (provider or os.getenv("WRITER_PROVIDER", "bedrock")).lower()
-        self.model = None
-        if provider == "bedrock":
+        self.model = model
+        if self.model is not None:
+            pass
+        elif provider == "bedrock":
             # Configure Bedrock model (Claude Sonnet) via Strands BedrockModel
             resolved_region = aws_region or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-west-2"
             resolved_bedrock_model_id = os.getenv("BEDROCK_MODEL_ID", bedrock_model_id)
-            self.model = BedrockModel(model_id=resolved_bedrock_model_id, region_name=resolved_region)
+            self.model = build_bedrock_model(resolved_bedrock_model_id, resolved_region, prompt_caching)
         else:
             raise ValueError(f"Unsupported provider '{provider}'.")
 
         # Combine built-in tools with custom tools
         default_tools = [calculator, current_time, content_analyzer, generate_hashtags]
         self.tools = default_tools + (tools or [])
+        # Tools the model may call unless a request picks its own; by default all but LOCAL_TOOLS,
+        # which run as pre/post-processing. WRITER_TOOLS is a comma-separated list ("" for none)
+        env_tools = os.getenv("WRITER_TOOLS")
+        if exposed_tools is not None:
+            self.exposed_tools = set(exposed_tools)
+        elif env_tools is not None:
+            self.exposed_tools = {name.strip() for name in env_tools.split(",") if name.strip()}
+        else:
+            self.exposed_tools = None
+        # Results of the local post-processing of the latest call
+        self.last_analysis: Dict[str, Any] = {}
+
+        # Stateless agents start every call from an empty conversation; otherwise the history
+        # carried into the next call is capped so input tokens stop growing with every request
+        self.stateless = (
+            stateless
+            if stateless is not None
+            else os.getenv("WRITER_STATELESS", "false").lower() in {"1", "true", "yes"}
+        )
+        self.max_history_tokens = max_history_tokens or int(os.getenv("WRITER_HISTORY_TOKEN_BUDGET", "4000"))
+        conversation_manager = (
+            NullConversationManager()
+            if self.stateless
+            else TokenWindowConversationManager(max_history_tokens=self.max_history_tokens)
+        )
+        # Token usage of the latest invoke or stream call
+        self.last_usage: Dict[str, int] = {}
 
         # Create the Strands Agent with selected model
         self.agent = Agent(
             model=self.model,
             system_prompt=self.system_prompt,
             tools=self.tools,
+            conversation_manager=conversation_manager,
         )
+        if self.exposed_tools is None:
+            self.exposed_tools = set(self.agent.tool_registry.registry) - LOCAL_TOOLS
+
+    @contextmanager
+    def _tools_for_call(self, tools: Optional[Iterable[str]], fallback_tools: Iterable[str] = ()) -> Iterator[None]:
+        """Offer the model only the selected tools (default ``exposed_tools``) for the duration of one call.
+
+        ``fallback_tools`` are added to the default selection, for local tools whose output could not be
+        precomputed for this request.
+        """
+        selected = set(self.exposed_tools if tools is None else tools)
+        if tools is None:
+            selected.update(fallback_tools)
+        # Tools already used in the history stay, since Bedrock needs the spec of every toolUse it is sent
+        for message in self.agent.messages:
+            for block in message.get("content", []):
+                if "toolUse" in block:
+                    selected.add(block["toolUse"]["name"])
+        registry = self.agent.tool_registry.registry
+        hidden = {name: registry.pop(name) for name in list(registry) if name not in selected}
+        try:
+            yield
+        finally:
+            registry.update(hidden)
 
-    def invoke(self, prompt_data: InputPrompt = None, query: str = None):
-        """Invoke the agent with either an InputPrompt object or a direct query string."""
+    def _preprocess(self, agent_query: str, prompt_data: Optional[InputPrompt]) -> Tuple[str, Set[str]]:
+        """Add locally generated hashtags so the model does not need a generate_hashtags round trip.
+
+        The topic is the product name, taken from ``prompt_data`` or else from a "Product Name:" line of
+        the query. Returns the query and the local tools the model still needs because nothing was
+        precomputed for them.
+        """
+        topic = prompt_data.product_name if prompt_data else None
+        if not topic:
+            match = _PRODUCT_NAME_LINE.search(agent_query)
+            topic = match.group(1) if match else None
+        if not topic:
+            return agent_query, {"generate_hashtags"}
+        hashtags = suggest_hashtags(topic)
+        return agent_query + "\n\nSuggested hashtags: " + ", ".join(hashtags), set()
+
+    def _postprocess(self, text: str):
+        self.last_analysis = analyze_content(text)
+
+    def reset(self):
+        """Forget the conversation so far"""
+        self.agent.messages = []
+
+    def _prompt_caching_enabled(self) -> bool:
+        config = self.model.get_config()
+        return isinstance(config, dict) and bool(config.get("cache_prompt") or config.get("cache_tools"))
+
+    def _disable_prompt_caching(self, error: Exception, history_length: int):
+        """Drop the cache points after the model rejected them, and undo the failed call's messages"""
+        print(f"⚠️ Prompt caching is not supported by this model, continuing without it: {error}")
+        # The model may be shared by several agents; none of them should send cache points again
+        self.model.update_config(cache_prompt=None, cache_tools=None)
+        del self.agent.messages[history_length:]
+
+    def _begin_call(self) -> Dict[str, int]:
+        if self.stateless:
+            self.reset()
+        usage = self.agent.event_loop_metrics.accumulated_usage
+        return {
+            "inputTokens": usage["inputTokens"],
+            "outputTokens": usage["outputTokens"],
+            "cacheReadInputTokens": usage.get("cacheReadInputTokens", 0),
+            "cacheWriteInputTokens": usage.get("cacheWriteInputTokens", 0),
+            "historyMessages": len(self.agent.messages),
+        }
+
+    def _end_call(self, before: Dict[str, int]):
+        # Strands accumulates usage over the agent's lifetime; the difference is this call's share
+        usage = self.agent.event_loop_metrics.accumulated_usage
+        self.last_usage = {
+            "inputTokens": usage["inputTokens"] - before["inputTokens"],
+            "outputTokens": usage["outputTokens"] - before["outputTokens"],
+            "cacheReadInputTokens": usage.get("cacheReadInputTokens", 0) - before["cacheReadInputTokens"],
+            "cacheWriteInputTokens": usage.get("cacheWriteInputTokens", 0) - before["cacheWriteInputTokens"],
+            "historyMessages": len(self.agent.messages),
+        }
+        record_model_tokens("writer", self.last_usage["inputTokens"], self.last_usage["outputTokens"])
+        if self._prompt_caching_enabled():
+            record_prompt_cache(
+                "writer", self.last_usage["cacheReadInputTokens"], self.last_usage["cacheWriteInputTokens"]
+            )
+
+    def _structured_output(self, output_model, agent_query: str):
+        """``agent.structured_output``, adding the call's token usage to the agent's metrics.
+
+        Strands only accumulates usage for event loop calls; the model's usage
+        chunk still reaches the callback handler, so it is picked up there.
+        """
+        callback_handler = self.agent.callback_handler
+
+        def record_usage(**kwargs):
+            event = kwargs.get("event")
+            if isinstance(event, dict) and "metadata" in event:
+                usage, _ = extract_usage_metrics(event["metadata"])
+                self.agent.event_loop_metrics.update_usage(usage)
+            callback_handler(**kwargs)
+
+        self.agent.callback_handler = record_usage
+        try:
+            return self.agent.structured_output(output_model, agent_query)
+        finally:
+            self.agent.callback_handler = callback_handler
+
+    def invoke(self, prompt_data: InputPrompt = None, query: str = None, tools: Optional[List[str]] = None):
+        """Invoke the agent with either an InputPrompt object or a direct query string.
+
+        ``tools`` names the tools the model may call for this request (default ``exposed_tools``).
+        Raises WriterError if the model call fails.
+        """
         try:
             if prompt_data:
                 # Convert prompt data to a query string for the agent
@@ -123,14 +328,28 @@ class WriterAgent:
                 agent_query = query
             else:
                 agent_query = "Create engaging social media content"
-            
-            response = self.agent(agent_query)
+
+            agent_query, fallback_tools = self._preprocess(agent_query, prompt_data)
+            before = self._begin_call()
+            with self._tools_for_call(tools, fallback_tools):
+                try:
+                    response = self.agent(agent_query)
+                except Exception as e:
+                    if not (self._prompt_caching_enabled() and _caching_unsupported(e)):
+                        raise
+                    self._disable_prompt_caching(e, before["historyMessages"])
+                    response = self.agent(agent_query)
+            self._end_call(before)
+            self._postprocess(str(response))
             return str(response.message)
         except Exception as e:
-            return f"Error invoking writer agent: {e}"
+            raise WriterError(f"Error invoking writer agent: {e}") from e
 
-    async def stream(self, prompt_data: InputPrompt = None, query: str = None):
-        """Stream the agent response with either an InputPrompt object or a direct query string."""
+    async def stream(self, prompt_data: InputPrompt = None, query: str = None, tools: Optional[List[str]] = None):
+        """Stream the agent response with either an InputPrompt object or a direct query string.
+
+        Raises WriterError if the model call fails, possibly after some chunks were yielded.
+        """
         try:
             if prompt_data:
                 # Convert prompt data to a query string for the agent
@@ -139,14 +358,82 @@ class WriterAgent:
                 agent_query = query
             else:
                 agent_query = "Create engaging social media content"
-            
-            async for event in self.agent.stream_async(agent_query):
-                if "data" in event:
-                    # Only stream text chunks to the client
-                    yield event["data"]
 
+            agent_query, fallback_tools = self._preprocess(agent_query, prompt_data)
+            before = self._begin_call()
+            chunks: List[str] = []
+            with self._tools_for_call(tools, fallback_tools):
+                try:
+                    async for chunk in self._stream_text(agent_query):
+                        chunks.append(chunk)
+                        yield chunk
+                except Exception as e:
+                    # Retrying is only safe while nothing has reached the client yet
+                    if chunks or not (self._prompt_caching_enabled() and _caching_unsupported(e)):
+                        raise
+                    self._disable_prompt_caching(e, before["historyMessages"])
+                    async for chunk in self._stream_text(agent_query):
+                        chunks.append(chunk)
+                        yield chunk
+            self._end_call(before)
+            self._postprocess("".join(chunks))
+
+        except Exception as e:
+            raise WriterError(f"We are unable to process your writing request at the moment. Error: {e}") from e
+
+    async def _stream_text(self, agent_query: str):
+        async for event in self.agent.stream_async(agent_query):
+            if "data" in event:
+                # Only stream text chunks to the client
+                yield event["data"]
+
+    def invoke_platforms(
+        self,
+        platforms: List[str],
+        prompt_data: InputPrompt = None,
+        query: str = None,
+        tools: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        """Write one caption per platform in a single structured-output call.
+
+        The product context is sent once and every variant is generated from
+        it, instead of one full request per platform. Returns {platform: caption}.
+        Raises WriterError if the model call fails.
+        """
+        try:
+            if prompt_data:
+                agent_query = self._format_prompt_data_as_query(prompt_data)
+            elif query:
+                agent_query = query
+            else:
+                agent_query = "Create engaging social media content"
+
+            # One required field per platform; the field description carries the platform's guidelines
+            captions_model = create_model(
+                "PlatformCaptions",
+                **{platform: (str, Field(description=PLATFORM_GUIDELINES[platform])) for platform in platforms},
+            )
+            agent_query, fallback_tools = self._preprocess(agent_query, prompt_data)
+            agent_query += (
+                "\n\nWrite a separate caption for each of these platforms, following each platform's guidelines: "
+                + ", ".join(platforms)
+            )
+            before = self._begin_call()
+            with self._tools_for_call(tools, fallback_tools):
+                try:
+                    captions = self._structured_output(captions_model, agent_query)
+                except Exception as e:
+                    if not (self._prompt_caching_enabled() and _caching_unsupported(e)):
+                        raise
+                    # Structured output never adds to the history, so nothing needs undoing
+                    self._disable_prompt_caching(e, before["historyMessages"])
+                    captions = self._structured_output(captions_model, agent_query)
+            self._end_call(before)
+            captions = {platform: getattr(captions, platform) for platform in platforms}
+            self.last_analysis = {platform: analyze_content(caption) for platform, caption in captions.items()}
+            return captions
         except Exception as e:
-            yield f"We are unable to process your writing request at the moment. Error: {e}"
+            raise WriterError(f"Error invoking writer agent: {e}") from e
 
     def _format_prompt_data_as_query(self, prompt_data: InputPrompt) -> str:
         """Format the InputPrompt data as a query string for the agent."""
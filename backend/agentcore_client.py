@@ -0,0 +1,153 @@
+"""
+Shared AgentCore runtime client for the FastAPI backend.
+
+One boto3 client is built at startup and reused for every invocation so that
+credential resolution, endpoint setup and TLS handshakes happen once. The
+connection pool, keep-alive and retry policy are configurable, and pool usage
+is tracked so it can be reported from the API.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+import boto3
+from botocore.config import Config
+
+from utils.telemetry import record_provider_error, record_provider_retry, stage
+
+
+@dataclass
+class AgentCoreClientSettings:
+    region_name: str = "us-west-2"
+    max_pool_connections: int = 32
+    tcp_keepalive: bool = True
+    max_attempts: int = 3
+    retry_mode: str = "adaptive"
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+
+    @classmethod
+    def from_env(cls) -> "AgentCoreClientSettings":
+        return cls(
+            region_name=os.getenv("AGENTCORE_REGION", cls.region_name),
+            max_pool_connections=int(os.getenv("AGENTCORE_MAX_POOL_CONNECTIONS", cls.max_pool_connections)),
+            tcp_keepalive=os.getenv("AGENTCORE_TCP_KEEPALIVE", "true").lower() in {"1", "true", "yes"},
+            max_attempts=int(os.getenv("AGENTCORE_MAX_ATTEMPTS", cls.max_attempts)),
+            retry_mode=os.getenv("AGENTCORE_RETRY_MODE", cls.retry_mode),
+            connect_timeout=float(os.getenv("AGENTCORE_CONNECT_TIMEOUT", cls.connect_timeout)),
+            read_timeout=float(os.getenv("AGENTCORE_READ_TIMEOUT", cls.read_timeout)),
+        )
+
+    def to_botocore_config(self) -> Config:
+        return Config(
+            region_name=self.region_name,
+            max_pool_connections=self.max_pool_connections,
+            tcp_keepalive=self.tcp_keepalive,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={"max_attempts": self.max_attempts, "mode": self.retry_mode},
+        )
+
+
+class AgentCoreClient:
+    """Thread-safe wrapper around a single pooled ``bedrock-agentcore`` client."""
+
+    def __init__(self, settings: Optional[AgentCoreClientSettings] = None) -> None:
+        self.settings = settings or AgentCoreClientSettings.from_env()
+        self._client = boto3.client("bedrock-agentcore", config=self.settings.to_botocore_config())
+        # Gate calls on the pool size so waiting for a connection is visible in the stats
+        self._slots = threading.BoundedSemaphore(self.settings.max_pool_connections)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._peak_in_use = 0
+        self._total_requests = 0
+        self._total_errors = 0
+        self._total_wait_seconds = 0.0
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        """Hold one pool slot for the duration of a call, recording usage"""
+        wait_start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        self._slots.acquire()
+        waited = time.perf_counter() - wait_start
+        with self._lock:
+            self._waiting -= 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._total_requests += 1
+            self._total_wait_seconds += waited
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self._total_errors += 1
+            record_provider_error("agentcore", e)
+            raise
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _invoke_runtime(self, agent_runtime_arn: str, session_id: str, payload: Dict[str, Any], qualifier: str):
+        response = self._client.invoke_agent_runtime(
+            agentRuntimeArn=agent_runtime_arn,
+            runtimeSessionId=session_id,
+            payload=json.dumps(payload),
+            qualifier=qualifier,
+        )
+        # botocore retries transparently; surface how often it had to
+        record_provider_retry("agentcore", "sdk", response.get("ResponseMetadata", {}).get("RetryAttempts", 0))
+        return response
+
+    def invoke(self, agent_runtime_arn: str, session_id: str, payload: Dict[str, Any], qualifier: str = "DEFAULT"):
+        """Invoke the agent runtime and return the decoded JSON response. Blocking."""
+        with stage("agentcore_invoke", streaming=False), self._slot():
+            response = self._invoke_runtime(agent_runtime_arn, session_id, payload, qualifier)
+            return json.loads(response["response"].read())
+
+    def invoke_stream(
+        self, agent_runtime_arn: str, session_id: str, payload: Dict[str, Any], qualifier: str = "DEFAULT"
+    ) -> Iterator[Any]:
+        """Invoke the agent runtime and yield each server-sent event payload as it arrives. Blocking."""
+        with stage("agentcore_invoke", streaming=True), self._slot():
+            response = self._invoke_runtime(agent_runtime_arn, session_id, payload, qualifier)
+            if "text/event-stream" not in response.get("contentType", ""):
+                # Runtime answered with a single JSON body
+                yield json.loads(response["response"].read())
+                return
+            for line in response["response"].iter_lines(chunk_size=1):
+                if not line:
+                    continue
+                line = line.decode("utf-8")
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                try:
+                    yield json.loads(data)
+                except json.JSONDecodeError:
+                    yield data
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage"""
+        with self._lock:
+            return {
+                "pool_size": self.settings.max_pool_connections,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "peak_in_use": self._peak_in_use,
+                "total_requests": self._total_requests,
+                "total_errors": self._total_errors,
+                "avg_wait_ms": (
+                    self._total_wait_seconds / self._total_requests * 1000 if self._total_requests else 0.0
+                ),
+                "retry_mode": self.settings.retry_mode,
+                "max_attempts": self.settings.max_attempts,
+            }
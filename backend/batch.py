@@ -0,0 +1,295 @@
+"""
+Batch campaign generation for many products at once.
+
+A batch is a JSONL or CSV list of InputPrompt records. Items are persisted in
+SQLite before any work starts and their status is updated as they finish, so
+an interrupted batch can be resumed and only unfinished items run again.
+Items fan out under a global concurrency limit, and calls to each provider
+are additionally throttled by a token-bucket rate limiter.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from prompts.InputPrompt import InputPrompt
+
+# Item statuses
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_LIST_FIELDS = {field.name for field in fields(InputPrompt) if "List" in str(field.type)}
+
+
+def parse_batch_records(data: bytes, filename: str = "") -> List[Dict[str, Any]]:
+    """Parse a JSONL or CSV upload into raw InputPrompt records.
+
+    CSV list columns (e.g. style_presets, product_images) may hold a JSON
+    array or a "|"-separated list. Records are validated when they run so a
+    bad row fails on its own instead of rejecting the whole batch.
+    """
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith(".csv"):
+        records = []
+        for row_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=1):
+            record: Dict[str, Any] = {}
+            try:
+                for key, value in row.items():
+                    if key is None or value is None or value.strip() == "":
+                        continue
+                    value = value.strip()
+                    if key in _LIST_FIELDS:
+                        value = json.loads(value) if value.startswith("[") else [
+                            item.strip() for item in value.split("|") if item.strip()
+                        ]
+                    record[key] = value
+            except json.JSONDecodeError as e:
+                # Keep the row so it is reported as a failed item
+                record = {"_error": f"Row {row_number}, column {key} is not valid JSON: {e}"}
+            records.append(record)
+        return records
+
+    records = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            # Keep the line so it is reported as a failed item
+            records.append({"_error": f"Line {line_number} is not valid JSON: {e}"})
+    return records
+
+
+def resolve_upload_path(path: Any, uploads_dir: str) -> str:
+    """Map a product image reference to a file inside ``uploads_dir``.
+
+    Accepts a path on disk or an ``/uploads/...`` URL as returned by the API.
+    Anything resolving outside the uploads directory (absolute paths, ``..``,
+    symlinks) is rejected, so a batch cannot make the backend read and send
+    arbitrary server files to the image provider.
+    """
+    if not isinstance(path, str) or not path:
+        raise ValueError("product_images entries must be non-empty strings")
+    if path.startswith("/uploads/"):
+        path = os.path.join(uploads_dir, path[len("/uploads/"):])
+    root = os.path.realpath(uploads_dir)
+    resolved = os.path.realpath(path)
+    if os.path.commonpath([resolved, root]) != root or not os.path.isfile(resolved):
+        raise ValueError(f"Product image '{path}' is not an uploaded file")
+    return resolved
+
+
+def input_prompt_from_record(record: Dict[str, Any], uploads_dir: str) -> InputPrompt:
+    if not isinstance(record, dict):
+        raise ValueError("Batch record must be a JSON object")
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    unknown = set(record) - {field.name for field in fields(InputPrompt)}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not record.get("product_name"):
+        raise ValueError("product_name is required")
+    images = record.get("product_images") or []
+    if not isinstance(images, list):
+        raise ValueError("product_images must be a list")
+    product_images = [resolve_upload_path(path, uploads_dir) for path in images]
+    return InputPrompt(**{**record, "product_images": product_images})
+
+
+class RateLimiter:
+    """Async token bucket: at most ``rate`` acquisitions per second with bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        self._rate = rate
+        self._capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self._rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    async def __aenter__(self) -> "RateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+@dataclass
+class BatchItem:
+    index: int
+    record: Dict[str, Any]
+    status: str = PENDING
+    caption: Optional[str] = None
+    image: Optional[str] = None
+    gallery: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def to_result(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "status": self.status,
+            "product_name": self.record.get("product_name") if isinstance(self.record, dict) else None,
+            "caption": self.caption,
+            "image": self.image,
+            "gallery": self.gallery,
+            "error": self.error,
+        }
+
+
+class BatchStore:
+    """SQLite persistence for batches and their items. Methods are blocking and thread-safe."""
+
+    def __init__(self, path: str) -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches (id TEXT PRIMARY KEY, created_at REAL NOT NULL, total INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batch_items (
+                    batch_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    record TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    caption TEXT,
+                    image TEXT,
+                    gallery TEXT NOT NULL DEFAULT '[]',
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (batch_id, idx)
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(batch_items)")}
+            if "gallery" not in columns:
+                # Databases created before image galleries were stored
+                self._conn.execute("ALTER TABLE batch_items ADD COLUMN gallery TEXT NOT NULL DEFAULT '[]'")
+
+    def create(self, records: List[Dict[str, Any]]) -> str:
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("INSERT INTO batches (id, created_at, total) VALUES (?, ?, ?)", (batch_id, now, len(records)))
+            self._conn.executemany(
+                "INSERT INTO batch_items (batch_id, idx, record, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(batch_id, index, json.dumps(record), PENDING, now) for index, record in enumerate(records)],
+            )
+            self._conn.execute("COMMIT")
+        return batch_id
+
+    def exists(self, batch_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM batches WHERE id = ?", (batch_id,)).fetchone() is not None
+
+    def items(self, batch_id: str, unfinished_only: bool = False) -> List[BatchItem]:
+        query = "SELECT idx, record, status, caption, image, gallery, error FROM batch_items WHERE batch_id = ?"
+        if unfinished_only:
+            # Failed items are retried on resume along with ones that never finished
+            query += f" AND status != '{SUCCEEDED}'"
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY idx", (batch_id,)).fetchall()
+        return [
+            BatchItem(
+                index=idx, record=json.loads(record), status=status,
+                caption=caption, image=image, gallery=json.loads(gallery), error=error,
+            )
+            for idx, record, status, caption, image, gallery, error in rows
+        ]
+
+    def update_item(self, batch_id: str, index: int, **values: Any) -> None:
+        if "gallery" in values:
+            values["gallery"] = json.dumps(values["gallery"])
+        values["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE batch_items SET {assignments} WHERE batch_id = ? AND idx = ?",
+                (*values.values(), batch_id, index),
+            )
+
+    def summary(self, batch_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT created_at, total FROM batches WHERE id = ?", (batch_id,)).fetchone()
+            counts = self._conn.execute(
+                "SELECT status, COUNT(*) FROM batch_items WHERE batch_id = ? GROUP BY status", (batch_id,)
+            ).fetchall()
+        created_at, total = row
+        return {"batch_id": batch_id, "created_at": created_at, "total": total, **dict(counts)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Generates content for one item, returning {"caption": ..., "image": ..., "gallery": [...]}
+ItemProcessor = Callable[[InputPrompt], Awaitable[Dict[str, Any]]]
+
+
+async def run_batch(
+    store: BatchStore,
+    batch_id: str,
+    process_item: ItemProcessor,
+    *,
+    concurrency: int,
+    uploads_dir: str,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run every unfinished item of a batch and yield each result as soon as it finishes.
+
+    Product images must be files under ``uploads_dir``; items referencing anything else fail.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(item: BatchItem) -> Dict[str, Any]:
+        async with semaphore:
+            await asyncio.to_thread(store.update_item, batch_id, item.index, status=RUNNING)
+            try:
+                result = await process_item(input_prompt_from_record(item.record, uploads_dir))
+                item.status, item.caption, item.image, item.error = (
+                    SUCCEEDED, result.get("caption"), result.get("image"), None
+                )
+                item.gallery = result.get("gallery") or []
+            except Exception as e:
+                item.status, item.error = FAILED, str(e)
+            await asyncio.to_thread(
+                store.update_item, batch_id, item.index,
+                status=item.status, caption=item.caption, image=item.image, gallery=item.gallery, error=item.error,
+            )
+            return item.to_result()
+
+    items = await asyncio.to_thread(store.items, batch_id, True)
+    tasks = [asyncio.create_task(run_item(item)) for item in items]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Client went away or the server is shutting down: items left running stay resumable
+        for task in tasks:
+            task.cancel()
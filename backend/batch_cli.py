@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Command-line client for batch campaign generation.
+
+Uploads a JSONL or CSV file of InputPrompt records to a running backend and
+prints each item's result as soon as it finishes. If the run is interrupted,
+resume it with the printed batch ID; only unfinished items run again.
+
+Usage:
+    python backend/batch_cli.py products.jsonl --output results.jsonl
+    python backend/batch_cli.py --resume <batch_id> --output results.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate content for many products in one batch")
+    parser.add_argument("file", nargs="?", help="JSONL or CSV file of InputPrompt records")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Resume an interrupted batch instead of starting a new one")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--output", help="Append item results as JSON lines to this file")
+    args = parser.parse_args()
+
+    if not args.file and not args.resume:
+        parser.error("either a batch file or --resume is required")
+
+    if args.resume:
+        request = {"method": "POST", "url": f"/batches/{args.resume}/resume"}
+    else:
+        with open(args.file, "rb") as handle:
+            content = handle.read()
+        request = {
+            "method": "POST",
+            "url": "/batches",
+            "files": {"file": (os.path.basename(args.file), content)},
+        }
+
+    output = open(args.output, "a", encoding="utf-8") if args.output else None
+    batch_id = args.resume
+    failures = 0
+    try:
+        with httpx.Client(base_url=args.url, timeout=httpx.Timeout(30.0, read=None)) as client:
+            with client.stream(**request) as response:
+                if response.status_code != 200:
+                    response.read()
+                    print(f"❌ Batch request failed ({response.status_code}): {response.text}")
+                    return 1
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    kind = event.pop("event", None)
+                    if kind == "batch":
+                        batch_id = event["batch_id"]
+                        print(f"🚀 Batch {batch_id}: {event['total']} items")
+                    elif kind == "item":
+                        if event["status"] == "succeeded":
+                            print(f"✅ [{event['index']}] {event['product_name']}")
+                        else:
+                            failures += 1
+                            print(f"❌ [{event['index']}] {event['product_name']}: {event['error']}")
+                        if output:
+                            output.write(json.dumps(event) + "\n")
+                            output.flush()
+                    elif kind == "done":
+                        print(f"🏁 Batch {batch_id} finished: {json.dumps(event)}")
+    except (httpx.HTTPError, KeyboardInterrupt) as e:
+        print(f"\n⚠️ Batch interrupted ({e.__class__.__name__}).")
+        if batch_id:
+            print(f"Resume with: python backend/batch_cli.py --resume {batch_id}")
+        return 1
+    finally:
+        if output:
+            output.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
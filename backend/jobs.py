@@ -0,0 +1,297 @@
+"""
+In-process job queue for workflows, persisted in SQLite.
+
+Jobs are submitted with the serialized InputPrompt, picked up by a bounded
+pool of asyncio workers and tracked per stage (writer, photographer) so
+clients can poll progress and a retry only re-runs the stages that failed.
+Finished jobs expire after a configurable TTL. Queued or running jobs left
+over from a previous process are picked up again on start.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+STAGES = ("writer", "photographer")
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Stage statuses (in addition to the ones above)
+PENDING = "pending"
+SKIPPED = "skipped"
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    input_prompt: Dict[str, Any]
+    # Per-request flags for the runner, e.g. force_refresh
+    options: Dict[str, Any] = field(default_factory=dict)
+    stages: Dict[str, str] = field(default_factory=lambda: {stage: PENDING for stage in STAGES})
+    caption: Optional[str] = None
+    # One caption per requested platform, keyed by platform name
+    captions: Dict[str, str] = field(default_factory=dict)
+    image: Optional[str] = None
+    # Every generated image variant: {"image", "thumbnail", "renditions", "srcset"}
+    gallery: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    expires_at: Optional[float] = None
+
+    def to_status(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": self.stages,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "expires_at": self.expires_at,
+        }
+
+
+class JobStore:
+    """SQLite persistence for jobs. Methods are blocking and thread-safe."""
+
+    _COLUMNS = (
+        "id", "status", "input_prompt", "options", "stages", "caption", "captions", "image", "gallery", "error",
+        "attempts", "created_at", "updated_at", "expires_at",
+    )
+
+    def __init__(self, path: str) -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    input_prompt TEXT NOT NULL,
+                    options TEXT NOT NULL DEFAULT '{}',
+                    stages TEXT NOT NULL,
+                    caption TEXT,
+                    captions TEXT NOT NULL DEFAULT '{}',
+                    image TEXT,
+                    gallery TEXT NOT NULL DEFAULT '[]',
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "gallery" not in columns:
+                # Databases created before image galleries were stored
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN gallery TEXT NOT NULL DEFAULT '[]'")
+            if "captions" not in columns:
+                # Databases created before per-platform captions were stored
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN captions TEXT NOT NULL DEFAULT '{}'")
+
+    def _row_to_job(self, row) -> Job:
+        values = dict(zip(self._COLUMNS, row))
+        values["input_prompt"] = json.loads(values["input_prompt"])
+        values["options"] = json.loads(values["options"])
+        values["stages"] = json.loads(values["stages"])
+        values["captions"] = json.loads(values["captions"])
+        values["gallery"] = json.loads(values["gallery"])
+        return Job(**values)
+
+    def insert(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({', '.join('?' for _ in self._COLUMNS)})",
+                (
+                    job.id, job.status, json.dumps(job.input_prompt), json.dumps(job.options),
+                    json.dumps(job.stages), job.caption, json.dumps(job.captions),
+                    job.image, json.dumps(job.gallery), job.error, job.attempts, job.created_at, job.updated_at, job.expires_at,
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        for name in ("stages", "captions", "gallery"):
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def set_stage(self, job_id: str, stage: str, status: str, **fields: Any) -> None:
+        """Update one stage's status atomically alongside any result fields"""
+        with self._lock:
+            row = self._conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return
+            stages = json.loads(row[0])
+            stages[stage] = status
+            fields["stages"] = json.dumps(stages)
+            for name in ("captions", "gallery"):
+                if name in fields:
+                    fields[name] = json.dumps(fields[name])
+            fields["updated_at"] = time.time()
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def unfinished_ids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now or time.time(),)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# A runner executes the stages of one job, reporting progress through the queue
+JobRunner = Callable[[Job, "JobQueue"], Awaitable[None]]
+
+
+class JobQueue:
+    """Bounded pool of asyncio workers draining jobs from a JobStore."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: JobRunner,
+        *,
+        workers: int = 4,
+        max_queued: int = 1000,
+        result_ttl_seconds: float = 3600.0,
+        purge_interval_seconds: float = 60.0,
+    ) -> None:
+        self.store = store
+        self._runner = runner
+        self._workers = workers
+        self._result_ttl_seconds = result_ttl_seconds
+        self._purge_interval_seconds = purge_interval_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+        # Resume jobs a previous process accepted but never finished
+        for job_id in await asyncio.to_thread(self.store.unfinished_ids):
+            await asyncio.to_thread(self.store.update, job_id, status=QUEUED)
+            await self._queue.put(job_id)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, input_prompt: Dict[str, Any], options: Optional[Dict[str, Any]] = None) -> Job:
+        """Persist a new job and enqueue it. Raises asyncio.QueueFull when the queue is at capacity."""
+        if self._queue.full():
+            raise asyncio.QueueFull()
+        job = Job(id=uuid.uuid4().hex, status=QUEUED, input_prompt=input_prompt, options=options or {})
+        await asyncio.to_thread(self.store.insert, job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def retry(self, job_id: str) -> Optional[Job]:
+        """Re-enqueue a job with failed stages; stages that already succeeded are kept"""
+        job = await self.get(job_id)
+        if not job or job.status in (QUEUED, RUNNING) or FAILED not in (job.status, *job.stages.values()):
+            return job
+        if self._queue.full():
+            raise asyncio.QueueFull()
+        stages = {stage: (status if status in (SUCCEEDED, SKIPPED) else PENDING) for stage, status in job.stages.items()}
+        await asyncio.to_thread(
+            self.store.update, job_id, status=QUEUED, stages=stages, error=None, expires_at=None
+        )
+        self._queue.put_nowait(job_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job and job.expires_at is not None and job.expires_at <= time.time():
+            return None
+        return job
+
+    async def set_stage(self, job_id: str, stage: str, status: str, **fields: Any) -> None:
+        await asyncio.to_thread(self.store.set_stage, job_id, stage, status, **fields)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self._workers, "queued_in_memory": self._queue.qsize(), **self.store.counts()}
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # Keep the worker alive; cancellation (a BaseException) still ends it
+                print(f"❌ Job {job_id} worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if not job or job.status not in (QUEUED, RUNNING):
+            return
+        await asyncio.to_thread(self.store.update, job_id, status=RUNNING, attempts=job.attempts + 1)
+        try:
+            # The runner raises when a required stage fails; optional stages may fail on their own
+            await self._runner(job, self)
+            status, error = SUCCEEDED, None
+        except asyncio.CancelledError:
+            # Shutting down: leave the job queued so the next process resumes it
+            await asyncio.to_thread(self.store.update, job_id, status=QUEUED)
+            raise
+        except Exception as e:
+            status, error = FAILED, str(e)
+        await asyncio.to_thread(
+            self.store.update, job_id, status=status, error=error,
+            expires_at=time.time() + self._result_ttl_seconds,
+        )
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._purge_interval_seconds)
+            try:
+                purged = await asyncio.to_thread(self.store.purge_expired)
+                if purged:
+                    print(f"🧹 Purged {purged} expired jobs")
+            except Exception as e:
+                print(f"❌ Job purge error: {e}")
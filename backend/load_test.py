@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Load test for the AgenticMarketers backend.
+
+Fires concurrent /start_workflow requests at a running backend while probing
+/health in the background, then reports whether the workflows overlapped or
+queued one after another and how responsive /health stayed meanwhile.
+
+Usage:
+    python backend/load_test.py --concurrency 4 --image path/to/product.jpg
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+
+
+async def run_workflow(client: httpx.AsyncClient, index: int, image_path: Optional[str]) -> Tuple[float, float, bool]:
+    """Submit one workflow and return (start, end, success) in perf_counter time"""
+    data = {
+        "product_name": f"Load Test Product {index}",
+        "product_description": "A product used to load test the workflow endpoint",
+    }
+    files = []
+    if image_path:
+        with open(image_path, "rb") as handle:
+            files.append(("product_images", (f"load_test_{index}_{os.path.basename(image_path)}", handle.read())))
+
+    start = time.perf_counter()
+    response = await client.post("/start_workflow", data=data, files=files or None)
+    end = time.perf_counter()
+    success = response.status_code == 200 and response.json().get("success", False)
+    return start, end, success
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> List[float]:
+    """Hit /health repeatedly until stopped, collecting latencies"""
+    latencies: List[float] = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"🧪 Load testing {args.url} with {args.concurrency} concurrent workflows")
+    print("=" * 50)
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+        stop = asyncio.Event()
+        health_task = asyncio.create_task(probe_health(client, stop, args.health_interval))
+
+        wall_start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_workflow(client, index, args.image) for index in range(args.concurrency))
+        )
+        wall_time = time.perf_counter() - wall_start
+
+        stop.set()
+        health_latencies = await health_task
+
+    durations = [end - start for start, end, _ in results]
+    successes = sum(1 for _, _, success in results if success)
+
+    # Peak number of workflows in flight at the same time
+    events = sorted([(start, 1) for start, _, _ in results] + [(end, -1) for _, end, _ in results])
+    in_flight = peak_in_flight = 0
+    for _, delta in events:
+        in_flight += delta
+        peak_in_flight = max(peak_in_flight, in_flight)
+
+    overlap_ratio = sum(durations) / wall_time if wall_time else 0.0
+
+    print(f"✅ Successful workflows: {successes}/{len(results)}")
+    print(f"⏱️  Wall time: {wall_time:.2f}s, sum of request times: {sum(durations):.2f}s")
+    print(f"📈 Mean workflow latency: {statistics.mean(durations):.2f}s, max: {max(durations):.2f}s")
+    print(f"🔀 Peak in-flight workflows: {peak_in_flight}, overlap ratio: {overlap_ratio:.2f}")
+    if health_latencies:
+        print(
+            f"💓 /health during load: {len(health_latencies)} probes, "
+            f"median {statistics.median(health_latencies) * 1000:.1f}ms, max {max(health_latencies) * 1000:.1f}ms"
+        )
+
+    # Queued requests give an overlap ratio near 1; overlapping ones approach the concurrency
+    if args.concurrency > 1 and overlap_ratio < 1.5:
+        print("⚠️ Workflows appear to be queuing one after another")
+    else:
+        print("✅ Workflows overlapped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for /start_workflow")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of simultaneous workflows")
+    parser.add_argument("--image", default=None, help="Optional product image to upload with each request")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--health-interval", type=float, default=0.25, help="Seconds between /health probes")
+    asyncio.run(main(parser.parse_args()))
@@ -3,24 +3,44 @@
 FastAPI backend for AgenticMarketers
 """
 
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+import ast
+import asyncio
+import contextvars
+import csv
+import functools
+import hashlib
+import re
+import uuid
 import sys
 import os
 import time
 from dotenv import load_dotenv
 import json
 import shutil
-import boto3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict, field
 
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.photographer.photographer import GeminiPhotographer, GeminiImage
+from agents.photographer.reference_preprocessor import ReferencePreprocessor
 from prompts.InputPrompt import InputPrompt
+from prompts.platforms import parse_platforms
+from backend.agentcore_client import AgentCoreClient
+from backend.jobs import Job, JobQueue, JobStore, QUEUED, RUNNING, SUCCEEDED, FAILED, SKIPPED
+from backend.batch import BatchStore, RateLimiter, parse_batch_records, run_batch
+from backend.result_cache import ResultCache, canonical_key, file_digest, normalize_input_prompt
+from backend.renditions import ImmutableStaticFiles, parse_widths, srcset, write_renditions
+from utils.telemetry import PROMETHEUS_CONTENT_TYPE, render_metrics, stage
 
 # Load environment variables
 load_dotenv()
@@ -28,16 +48,103 @@ load_dotenv()
 # Create uploads directory if it doesn't exist
 UPLOADS_DIR = "uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
+# Content-hashed responsive renditions of generated images, served with long-lived cache headers
+RENDITIONS_DIR = os.path.join(UPLOADS_DIR, "renditions")
+os.makedirs(RENDITIONS_DIR, exist_ok=True)
+RENDITION_WIDTHS = parse_widths(os.getenv("RENDITION_WIDTHS", "320,640,1024"))
 AGENT_CORE_ARN = os.getenv("AGENT_CORE_ARN")
 AGENT_CORE_SESSION_ID = os.getenv("AGENT_CORE_SESSION_ID")
+# Per-branch timeouts for the writer (AgentCore) and photographer (Gemini) calls
+CAPTION_TIMEOUT_SECONDS = float(os.getenv("CAPTION_TIMEOUT_SECONDS", "120"))
+IMAGE_TIMEOUT_SECONDS = float(os.getenv("IMAGE_TIMEOUT_SECONDS", "180"))
+# Image variants per request (A/B creatives)
+IMAGE_CANDIDATE_COUNT = int(os.getenv("IMAGE_CANDIDATE_COUNT", "4"))
+MAX_IMAGE_CANDIDATES = int(os.getenv("MAX_IMAGE_CANDIDATES", "8"))
+# Threads shared by all requests for parallel single-candidate Gemini calls (models without multi-candidate support)
+GEMINI_GENERATE_CONCURRENCY = int(os.getenv("GEMINI_GENERATE_CONCURRENCY", "16"))
+# Upload limits; files are streamed to disk in chunks so memory stays flat regardless of size
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_REQUEST_UPLOAD_BYTES = int(os.getenv("MAX_REQUEST_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+# Upper bound on threads doing blocking provider (boto3, Gemini), PIL and disk work
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "16"))
+# Background job queue for /jobs
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+# Batch generation: global item concurrency plus per-provider request rates
+BATCH_DB_PATH = os.getenv("BATCH_DB_PATH", "batches.db")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+WRITER_RATE_PER_SECOND = float(os.getenv("WRITER_RATE_PER_SECOND", "2"))
+PHOTOGRAPHER_RATE_PER_SECOND = float(os.getenv("PHOTOGRAPHER_RATE_PER_SECOND", "1"))
+# Opt-in cache of captions and generated images for identical requests
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "false").lower() in {"1", "true", "yes"}
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", ".cache/results")
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+# Writer settings deployed to the AgentCore runtime; part of the caption cache key
+WRITER_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "us.anthropic.claude-3-7-sonnet-20250219-v1:0")
+WRITER_TEMPERATURE = float(os.getenv("WRITER_TEMPERATURE", "0.7"))
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the bounded executor so the event loop stays responsive"""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context over so spans started in the thread nest under the request's
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(blocking_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+# Shared AgentCore client and job queue, created once at startup
+agentcore_client: Optional[AgentCoreClient] = None
+job_queue: Optional[JobQueue] = None
+batch_store: Optional[BatchStore] = None
+writer_rate_limiter = RateLimiter(WRITER_RATE_PER_SECOND)
+photographer_rate_limiter = RateLimiter(PHOTOGRAPHER_RATE_PER_SECOND)
+
+result_cache: Optional[ResultCache] = None
+if RESULT_CACHE_ENABLED:
+    result_cache = ResultCache(
+        RESULT_CACHE_DIR,
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global agentcore_client, job_queue, batch_store
+    agentcore_client = AgentCoreClient()
+    print(f"✅ AgentCore client ready (pool size {agentcore_client.settings.max_pool_connections})")
+    job_queue = JobQueue(
+        JobStore(JOBS_DB_PATH),
+        run_workflow_job,
+        workers=JOB_WORKERS,
+        max_queued=JOB_MAX_QUEUED,
+        result_ttl_seconds=JOB_RESULT_TTL_SECONDS,
+    )
+    await job_queue.start()
+    print(f"✅ Job queue ready ({JOB_WORKERS} workers)")
+    batch_store = BatchStore(BATCH_DB_PATH)
+    yield
+    await job_queue.stop()
+    job_queue.store.close()
+    batch_store.close()
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
+
 
 app = FastAPI(
     title="AgenticMarketers API",
     description="AI-powered marketing content generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Mount static files for serving uploaded images
+# Mount static files for serving uploaded images; renditions first so their mount wins
+app.mount("/uploads/renditions", ImmutableStaticFiles(directory=RENDITIONS_DIR), name="renditions")
 app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
 
 # Configure CORS for development
@@ -67,36 +174,39 @@ class WorkflowRequest(BaseModel):
     color_palette: Optional[str] = None
     additional_modifiers: Optional[str] = None
 
+class GalleryImage(BaseModel):
+    image: str
+    thumbnail: Optional[str] = None
+    # {format: {width: url}} and the matching srcset value per format
+    renditions: Dict[str, Dict[str, str]] = {}
+    srcset: Dict[str, str] = {}
+
+
 class WorkflowResponse(BaseModel):
     success: bool
     message: str
     caption: Optional[str] = None
+    # One caption per requested platform; caption is the first platform's
+    captions: Dict[str, str] = {}
     image: Optional[str] = None
+    # Every generated variant; image is the first one
+    gallery: List[GalleryImage] = []
 
 
-# Initialize GeminiPhotographer
-try:
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        print("⚠️ GEMINI_API_KEY not found, photographer will not be available")
-        photographer_agent = None
-    else:
-        photographer_agent = GeminiPhotographer(api_key=gemini_api_key)
-        print("✅ GeminiPhotographer initialized successfully")
-except Exception as e:
-    print(f"❌ Failed to initialize GeminiPhotographer: {e}")
-    photographer_agent = None
+@dataclass
+class WorkflowSubmission:
+    """Form fields of a workflow request plus the not-yet-saved uploads"""
+    input_prompt: InputPrompt
+    uploads: List[UploadFile]
+    # Skip the result cache and always generate fresh content
+    force_refresh: bool = False
+    # Number of image variants; defaults to IMAGE_CANDIDATE_COUNT
+    candidate_count: Optional[int] = None
+    # Platforms to write a caption for in one writer call; empty for a single generic caption
+    platforms: List[str] = field(default_factory=list)
 
-@app.get("/")
-async def root():
-    """Health check endpoint"""
-    return {
-        "message": "AgenticMarketers API is running",
-        "status": "healthy",
-    }
 
-@app.post("/start_workflow", response_model=WorkflowResponse)
-async def start_workflow(
+async def workflow_form(
     product_images: List[UploadFile] = File(default=[]),
     product_name: str = Form(...),
     product_description: str = Form(...),
@@ -111,154 +221,657 @@ async def start_workflow(
     mood: Optional[str] = Form(None),
     camera_setup: Optional[str] = Form(None),
     color_palette: Optional[str] = Form(None),
-    additional_modifiers: Optional[str] = Form(None)
-):
-    """
-    Main workflow endpoint that processes form data with file uploads and generates content
-    """
+    additional_modifiers: Optional[str] = Form(None),
+    force_refresh: bool = Form(False),
+    candidate_count: Optional[int] = Form(None, ge=1, le=MAX_IMAGE_CANDIDATES),
+    platforms: Optional[str] = Form(None)
+) -> WorkflowSubmission:
+    """Shared form parsing for the workflow endpoints"""
     try:
-        
-        # Process uploaded images
-        image_paths = []
-        for image in product_images:
+        # Comma-separated, e.g. "instagram,x,linkedin,tiktok"
+        platform_list = parse_platforms(platforms) if platforms else []
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Convert form data to InputPrompt object; image paths are filled in once uploads are saved
+    input_prompt = InputPrompt(
+        product_images=[],
+        product_name=product_name,
+        product_description=product_description,
+        product_main_features=product_main_features,
+        product_benefits=product_benefits,
+        product_use_cases=product_use_cases,
+        product_pricing=product_pricing,
+        product_target_audience=product_target_audience,
+        background_scene=background_scene,
+        composition_style=composition_style,
+        lighting_preferences=lighting_preferences,
+        mood=mood,
+        camera_setup=camera_setup,
+        color_palette=color_palette,
+        additional_modifiers=additional_modifiers
+    )
+    return WorkflowSubmission(
+        input_prompt=input_prompt,
+        uploads=product_images,
+        force_refresh=force_refresh,
+        candidate_count=candidate_count,
+        platforms=platform_list,
+    )
+
+
+# Initialize GeminiPhotographer
+try:
+    gemini_api_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_api_key:
+        print("⚠️ GEMINI_API_KEY not found, photographer will not be available")
+        photographer_agent = None
+    else:
+        photographer_agent = GeminiPhotographer(
+            api_key=gemini_api_key,
+            candidate_count=IMAGE_CANDIDATE_COUNT,
+            generate_concurrency=GEMINI_GENERATE_CONCURRENCY,
+            reference_preprocessor=ReferencePreprocessor(
+                max_edge=int(os.getenv("REFERENCE_MAX_EDGE", "2048")),
+                output_format=os.getenv("REFERENCE_FORMAT", "JPEG"),
+            ),
+        )
+        print("✅ GeminiPhotographer initialized successfully")
+except Exception as e:
+    print(f"❌ Failed to initialize GeminiPhotographer: {e}")
+    photographer_agent = None
+
+_CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _upload_extension(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,5}", extension) else ""
+
+
+def _finalize_upload(temp_path: str, final_path: str) -> None:
+    """Move a fully written upload into place, or drop it if identical content is already stored"""
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, final_path)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def save_upload(image: UploadFile, request_budget: int) -> Tuple[str, int]:
+    """Stream one upload to a content-addressed path under UPLOADS_DIR, hashing as it is written"""
+    limit = min(MAX_UPLOAD_BYTES, request_budget)
+    if image.size is not None and image.size > limit:
+        raise HTTPException(status_code=413, detail=f"Upload '{image.filename}' is too large")
+
+    digest = hashlib.sha256()
+    written = 0
+    temp_path = os.path.join(UPLOADS_DIR, f".upload-{os.urandom(8).hex()}.tmp")
+    handle = await run_blocking(open, temp_path, "wb")
+    try:
+        try:
+            while chunk := await image.read(UPLOAD_CHUNK_BYTES):
+                written += len(chunk)
+                if written > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload '{image.filename}' is too large")
+                digest.update(chunk)
+                await run_blocking(handle.write, chunk)
+        finally:
+            await run_blocking(handle.close)
+        # Identical uploads share one file on disk
+        final_path = os.path.join(UPLOADS_DIR, f"{digest.hexdigest()}{_upload_extension(image.filename)}")
+        await run_blocking(_finalize_upload, temp_path, final_path)
+    except BaseException:
+        await run_blocking(_remove_file, temp_path)
+        raise
+    return final_path, written
+
+
+async def save_uploads(uploads: List[UploadFile]) -> List[str]:
+    """Save uploaded files to the uploads directory and return their paths"""
+    image_paths = []
+    remaining = MAX_REQUEST_UPLOAD_BYTES
+    with stage("upload_save", files=len(uploads)):
+        for image in uploads:
             if image.filename:
-                # Save uploaded file to uploads directory
-                file_path = os.path.join(UPLOADS_DIR, image.filename)
-                with open(file_path, "wb") as buffer:
-                    content = await image.read()
-                    buffer.write(content)
+                file_path, size = await save_upload(image, remaining)
+                remaining -= size
                 image_paths.append(file_path)
-        
-        # Convert form data to InputPrompt object
-        input_prompt = InputPrompt(
-            product_images=image_paths,
-            product_name=product_name,
-            product_description=product_description,
-            product_main_features=product_main_features,
-            product_benefits=product_benefits,
-            product_use_cases=product_use_cases,
-            product_pricing=product_pricing,
-            product_target_audience=product_target_audience,
-            background_scene=background_scene,
-            composition_style=composition_style,
-            lighting_preferences=lighting_preferences,
-            mood=mood,
-            camera_setup=camera_setup,
-            color_palette=color_palette,
-            additional_modifiers=additional_modifiers
-        )
-        
-        # Generate content using WriterAgent
-        print(f"🚀 Starting workflow for product: {product_name}")
+    return image_paths
+
+
+def _reference_digest(path: str) -> str:
+    """Content digest of an upload; content-addressed uploads are named after it"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem if _CONTENT_ADDRESSED_NAME.match(stem) else file_digest(path)
 
-        # Create a prompt for the AgentCore agent
-        prompt = f"""
+
+def _build_caption_prompt(input_prompt: InputPrompt) -> str:
+    """Create a prompt for the AgentCore agent"""
+    return f"""
         Create engaging marketing content for the following product:
         
-        Product Name: {product_name}
-        Description: {product_description}
-        Main Features: {product_main_features or 'Not specified'}
-        Benefits: {product_benefits or 'Not specified'}
-        Use Cases: {product_use_cases or 'Not specified'}
-        Pricing: {product_pricing or 'Not specified'}
-        Target Audience: {product_target_audience or 'Not specified'}
+        Product Name: {input_prompt.product_name}
+        Description: {input_prompt.product_description}
+        Main Features: {input_prompt.product_main_features or 'Not specified'}
+        Benefits: {input_prompt.product_benefits or 'Not specified'}
+        Use Cases: {input_prompt.product_use_cases or 'Not specified'}
+        Pricing: {input_prompt.product_pricing or 'Not specified'}
+        Target Audience: {input_prompt.product_target_audience or 'Not specified'}
         
         Please create a compelling social media caption that highlights the key benefits and features of this product.
         """
 
-        content_result = await invoke_agent_agentcore(prompt)
 
-        try:
-            # Handle different types of content_result
-            if isinstance(content_result, str):
-                parsed_result = json.loads(content_result)
-            elif isinstance(content_result, dict):
-                parsed_result = content_result
-            else:
-                parsed_result = content_result
-            
-            # Handle the specific structure: {'role': 'assistant', 'content': [{'text': '...'}]}
-            if isinstance(parsed_result, dict) and 'content' in parsed_result:
-                content_list = parsed_result['content']
-                
-                if isinstance(content_list, list) and len(content_list) > 0:
-                    first_item = content_list[0]
-                    
-                    if isinstance(first_item, dict) and 'text' in first_item:
-                        caption = first_item['text']
-                    else:
-                        caption = str(first_item)
-                else:
-                    caption = str(content_list)
-            else:
-                caption = str(content_result)
-                
-        except (json.JSONDecodeError, AttributeError, KeyError, IndexError) as e:
-            caption = str(content_result)
-        
-        # Generate image using photographer agent or use uploaded image
-        if photographer_agent and image_paths:
-            try:
-                # Load the uploaded image as reference
-                from PIL import Image
-                reference_image = Image.open(image_paths[0])
-                reference_gemini = GeminiImage(reference_image)
-
-                # Create a prompt for image generation based on form data
-                image_prompt = f"""
-                Create a professional product photo for: {product_name}
-                Description: {product_description}
-                Key features: {product_main_features or 'N/A'}
-                Benefits: {product_benefits or 'N/A'}
-                Target audience: {product_target_audience or 'N/A'}
-                Background scene: {background_scene or 'clean, professional background'}
-                Composition style: {composition_style or 'centered, well-lit'}
-                Lighting preferences: {lighting_preferences or 'soft, even lighting'}
-                Mood: {mood or 'professional and appealing'}
-                Camera setup: {camera_setup or 'professional product photography'}
-                Color palette: {color_palette or 'natural colors'}
-                Additional modifiers: {additional_modifiers or 'high quality, commercial photography'}
+def _build_image_prompt(input_prompt: InputPrompt) -> str:
+    """Create a prompt for image generation based on form data"""
+    return f"""
+                Create a professional product photo for: {input_prompt.product_name}
+                Description: {input_prompt.product_description}
+                Key features: {input_prompt.product_main_features or 'N/A'}
+                Benefits: {input_prompt.product_benefits or 'N/A'}
+                Target audience: {input_prompt.product_target_audience or 'N/A'}
+                Background scene: {input_prompt.background_scene or 'clean, professional background'}
+                Composition style: {input_prompt.composition_style or 'centered, well-lit'}
+                Lighting preferences: {input_prompt.lighting_preferences or 'soft, even lighting'}
+                Mood: {input_prompt.mood or 'professional and appealing'}
+                Camera setup: {input_prompt.camera_setup or 'professional product photography'}
+                Color palette: {input_prompt.color_palette or 'natural colors'}
+                Additional modifiers: {input_prompt.additional_modifiers or 'high quality, commercial photography'}
                 
                 Generate a high-quality, professional product image that would be suitable for marketing and social media.
                 """
 
-                # Generate new image using the photographer
-                generated_images = photographer_agent.generate_images(
-                    prompt=image_prompt,
-                    reference_images=[reference_gemini]
-                )
-
-                if generated_images:
-                    # Save the generated image
-                    generated_image = generated_images[0]
-                    generated_filename = f"generated_{product_name.replace(' ', '_')}_{int(time.time())}.png"
-                    generated_path = os.path.join(UPLOADS_DIR, generated_filename)
-                    generated_image.save(generated_path)
-                    image_url = f"/uploads/{generated_filename}"
-                    print(f"✅ Generated new image: {generated_filename}")
-                else:
-                    # Fallback to uploaded image
-                    image_url = f"/uploads/{os.path.basename(image_paths[0])}"
-                    print("⚠️ No images generated, using uploaded image")
 
-            except Exception as e:
-                print(f"❌ Error generating image: {e}")
-                # Fallback to uploaded image
-                image_url = f"/uploads/{os.path.basename(image_paths[0])}"
-        elif image_paths:
-            # Use uploaded image if photographer not available
-            image_url = f"/uploads/{os.path.basename(image_paths[0])}"
+def _parse_caption(content_result: Any) -> str:
+    """Extract the caption text from an AgentCore response"""
+    try:
+        # Handle different types of content_result
+        if isinstance(content_result, str):
+            parsed_result = json.loads(content_result)
+        elif isinstance(content_result, dict):
+            parsed_result = content_result
         else:
-            # Use mock image as last resort
-            image_url = "https://via.placeholder.com/400x400/000000/FFFFFF?text=Product+Image"
+            parsed_result = content_result
+
+        # The runtime answers {"result": str(message)}, the message dict's Python repr
+        if isinstance(parsed_result, dict) and isinstance(parsed_result.get("result"), str):
+            try:
+                parsed_result = ast.literal_eval(parsed_result["result"])
+            except (ValueError, SyntaxError):
+                return parsed_result["result"]
         
-        return WorkflowResponse(
-            success=True,
-            message="Content generated successfully!",
-            caption=caption,
-            image=image_url
+        # Handle the specific structure: {'role': 'assistant', 'content': [{'text': '...'}]}
+        if isinstance(parsed_result, dict) and 'content' in parsed_result:
+            content_list = parsed_result['content']
+            
+            if isinstance(content_list, list) and len(content_list) > 0:
+                first_item = content_list[0]
+                
+                if isinstance(first_item, dict) and 'text' in first_item:
+                    return first_item['text']
+                return str(first_item)
+            return str(content_list)
+        return str(content_result)
+            
+    except (json.JSONDecodeError, AttributeError, KeyError, IndexError) as e:
+        return str(content_result)
+
+
+def _runtime_error(content_result: Any) -> Optional[str]:
+    """The failure message when the AgentCore runtime answered with an error instead of content"""
+    if isinstance(content_result, dict) and "error" in content_result:
+        return str(content_result.get("error") or content_result.get("message") or "unknown error")
+    return None
+
+
+def _caption_cache_key(input_prompt: InputPrompt, prompt: str) -> str:
+    return canonical_key(
+        kind="caption",
+        input_prompt=normalize_input_prompt(input_prompt),
+        prompt=prompt,
+        agent=AGENT_CORE_ARN,
+        model_id=WRITER_MODEL_ID,
+        temperature=WRITER_TEMPERATURE,
+    )
+
+
+def _captions_cache_key(input_prompt: InputPrompt, prompt: str, platforms: List[str]) -> str:
+    return canonical_key(
+        kind="captions",
+        input_prompt=normalize_input_prompt(input_prompt),
+        prompt=prompt,
+        platforms=platforms,
+        agent=AGENT_CORE_ARN,
+        model_id=WRITER_MODEL_ID,
+        temperature=WRITER_TEMPERATURE,
+    )
+
+
+def _image_cache_key(input_prompt: InputPrompt, prompt: str, candidate_count: int) -> str:
+    """Blocking: hashes the reference image on disk"""
+    return canonical_key(
+        kind="image",
+        input_prompt=normalize_input_prompt(input_prompt),
+        prompt=prompt,
+        model_id=photographer_agent.model_name,
+        candidate_count=candidate_count,
+        references=[_reference_digest(input_prompt.product_images[0])],
+    )
+
+
+async def _cached_caption(input_prompt: InputPrompt, prompt: str, force_refresh: bool) -> Optional[str]:
+    if not result_cache or force_refresh:
+        return None
+    cached = await run_blocking(result_cache.get, _caption_cache_key(input_prompt, prompt))
+    if cached:
+        print(f"♻️ Using cached caption for product: {input_prompt.product_name}")
+        return cached["caption"]
+    return None
+
+
+async def generate_caption(input_prompt: InputPrompt, force_refresh: bool = False) -> str:
+    """Writer branch: ask the AgentCore agent for a caption"""
+    with stage("caption_generation") as span:
+        prompt = _build_caption_prompt(input_prompt)
+        cached = await _cached_caption(input_prompt, prompt, force_refresh)
+        if span is not None:
+            span.set_attribute("cached", cached is not None)
+        if cached is not None:
+            return cached
+
+        content_result = await invoke_agent_agentcore(prompt)
+        # Failures must never reach the cache, where they would be served for the whole TTL
+        error = _runtime_error(content_result)
+        if error is not None:
+            raise RuntimeError(f"Writer failed: {error}")
+        caption = _parse_caption(content_result)
+        if result_cache and caption:
+            await run_blocking(result_cache.put, _caption_cache_key(input_prompt, prompt), {"caption": caption})
+        return caption
+
+
+async def generate_captions(
+    input_prompt: InputPrompt, platforms: List[str], force_refresh: bool = False
+) -> Dict[str, str]:
+    """Writer branch, multi-platform: one AgentCore call returns a caption per platform"""
+    with stage("caption_generation", platforms=",".join(platforms)) as span:
+        prompt = _build_caption_prompt(input_prompt)
+        cached = None
+        if result_cache and not force_refresh:
+            cached = await run_blocking(result_cache.get, _captions_cache_key(input_prompt, prompt, platforms))
+        if span is not None:
+            span.set_attribute("cached", cached is not None)
+        if cached:
+            print(f"♻️ Using cached captions for product: {input_prompt.product_name}")
+            return cached["captions"]
+
+        content_result = await invoke_agent_agentcore(prompt, platforms=platforms)
+        if not isinstance(content_result, dict) or not isinstance(content_result.get("captions"), dict):
+            error = content_result.get("error") if isinstance(content_result, dict) else None
+            raise RuntimeError(f"Writer returned no platform captions: {error or content_result}")
+        captions = {platform: str(content_result["captions"].get(platform) or "") for platform in platforms}
+        missing = [platform for platform, caption in captions.items() if not caption]
+        if missing:
+            # A partial result is returned, but never cached where it would be served for the whole TTL
+            print(f"⚠️ Writer returned no caption for: {', '.join(missing)}")
+        elif result_cache:
+            await run_blocking(
+                result_cache.put, _captions_cache_key(input_prompt, prompt, platforms), {"captions": captions}
+            )
+        return captions
+
+
+async def stream_caption(input_prompt: InputPrompt, force_refresh: bool = False) -> AsyncIterator[str]:
+    """Writer branch, streaming: yield caption chunks as the AgentCore runtime produces them"""
+    prompt = _build_caption_prompt(input_prompt)
+    cached = await _cached_caption(input_prompt, prompt, force_refresh)
+    if cached is not None:
+        yield cached
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    finished = object()
+    payload = {"input": {"prompt": prompt, "stream": True}}
+    chunks: List[str] = []
+
+    def pump():
+        try:
+            for event in agentcore_client.invoke_stream(AGENT_CORE_ARN, AGENT_CORE_SESSION_ID, payload):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    loop.run_in_executor(blocking_executor, contextvars.copy_context().run, pump)
+    deadline = loop.time() + CAPTION_TIMEOUT_SECONDS
+    try:
+        while True:
+            item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+            if item is finished:
+                break
+            if isinstance(item, Exception):
+                print(f"❌ AgentCore invocation error: {item}")
+                raise item
+            # The runtime reports a failed stream as one {"error": ..., "error_type": ...} event
+            error = _runtime_error(item)
+            if error is not None:
+                print(f"❌ Writer stream error: {error}")
+                raise RuntimeError(f"Writer failed: {error}")
+            # Streamed chunks are plain text; a non-streaming runtime answers with one JSON body
+            chunk = item if isinstance(item, str) else _parse_caption(item)
+            chunks.append(chunk)
+            yield chunk
+        if result_cache and chunks:
+            await run_blocking(result_cache.put, _caption_cache_key(input_prompt, prompt), {"caption": "".join(chunks)})
+    finally:
+        # Stops the reader thread on timeout, error or client disconnect
+        stop.set()
+
+
+def _slugify(text: Optional[str]) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", text or "").strip("_")
+    return slug[:60] or "product"
+
+
+def _save_generated_image(image, stem: str) -> Dict[str, Any]:
+    """Save a generated image at full size plus its responsive renditions.
+
+    The full PNG stays available for download; previews use the renditions,
+    the smallest WebP one doubling as the thumbnail.
+    """
+    generated_filename = f"{stem}.png"
+    image.save(os.path.join(UPLOADS_DIR, generated_filename))
+
+    renditions = write_renditions(image, RENDITIONS_DIR, "/uploads/renditions", RENDITION_WIDTHS)
+    webp = renditions["webp"]
+    return {
+        "image": f"/uploads/{generated_filename}",
+        "thumbnail": webp[min(webp, key=int)],
+        "renditions": renditions,
+        "srcset": {name: srcset(urls) for name, urls in renditions.items()},
+    }
+
+
+def _gallery_on_disk(gallery: List[Dict[str, Any]]) -> bool:
+    urls = []
+    for entry in gallery:
+        if "renditions" not in entry:
+            # Cached before renditions existed
+            return False
+        urls += [entry["image"], entry["thumbnail"]]
+        for urls_by_width in entry["renditions"].values():
+            urls += urls_by_width.values()
+    return all(os.path.exists(os.path.join(UPLOADS_DIR, url[len("/uploads/"):])) for url in urls)
+
+
+def _generate_image_sync(
+    input_prompt: InputPrompt, force_refresh: bool = False, candidate_count: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Generate and save product image variants, returning the gallery (empty if nothing came back)"""
+    with stage("image_generation"):
+        return _generate_gallery(input_prompt, force_refresh, candidate_count)
+
+
+def _generate_gallery(
+    input_prompt: InputPrompt, force_refresh: bool, candidate_count: Optional[int]
+) -> List[Dict[str, Any]]:
+    candidate_count = candidate_count or IMAGE_CANDIDATE_COUNT
+    image_prompt = _build_image_prompt(input_prompt)
+    cache_key = _image_cache_key(input_prompt, image_prompt, candidate_count) if result_cache else None
+    if cache_key and not force_refresh:
+        cached = result_cache.get(cache_key)
+        # The cached files may have been cleaned out of the uploads directory
+        if cached and _gallery_on_disk(cached["gallery"]):
+            print(f"♻️ Using cached images for product: {input_prompt.product_name}")
+            return cached["gallery"]
+
+    # Load the uploaded image as reference; JPEG/PNG/WebP uploads are passed through without re-encoding
+    reference_gemini = GeminiImage.from_path(input_prompt.product_images[0])
+
+    # Generate new image variants using the photographer
+    generated_images = photographer_agent.generate_images(
+        prompt=image_prompt,
+        reference_images=[reference_gemini],
+        candidate_count=candidate_count,
+    )
+    if not generated_images:
+        return []
+
+    # Save every variant; the random tag keeps concurrent requests for the same product apart
+    stem = f"generated_{_slugify(input_prompt.product_name)}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    with stage("image_save", images=len(generated_images)):
+        gallery = [
+            _save_generated_image(generated_image, f"{stem}_{index}")
+            for index, generated_image in enumerate(generated_images, start=1)
+        ]
+    print(f"✅ Generated {len(gallery)} new image(s): {stem}")
+    if cache_key:
+        result_cache.put(cache_key, {"gallery": gallery})
+    return gallery
+
+
+async def generate_image(
+    input_prompt: InputPrompt, force_refresh: bool = False, candidate_count: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Photographer branch: Gemini call, PIL decoding and the disk saves all run off the loop"""
+    return await run_blocking(_generate_image_sync, input_prompt, force_refresh, candidate_count)
+
+
+def _fallback_image_url(image_paths: List[str]) -> str:
+    if image_paths:
+        # Fallback to uploaded image
+        return f"/uploads/{os.path.basename(image_paths[0])}"
+    # Use mock image as last resort
+    return "https://via.placeholder.com/400x400/000000/FFFFFF?text=Product+Image"
+
+
+async def _resolve_images(
+    image_task: Optional[asyncio.Task], image_paths: List[str]
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Wait for the photographer branch and return (main image URL, gallery).
+
+    Falls back to the uploaded image with an empty gallery if generation fails.
+    """
+    image_url = _fallback_image_url(image_paths)
+    if not image_task:
+        return image_url, []
+    try:
+        gallery = await image_task
+        if gallery:
+            return gallery[0]["image"], gallery
+        print("⚠️ No images generated, using uploaded image")
+    except asyncio.TimeoutError:
+        print(f"❌ Image generation timed out after {IMAGE_TIMEOUT_SECONDS:.0f}s, using uploaded image")
+    except Exception as e:
+        print(f"❌ Error generating image: {e}")
+    return image_url, []
+
+
+def _start_image_task(
+    input_prompt: InputPrompt, force_refresh: bool = False, candidate_count: Optional[int] = None
+) -> Optional[asyncio.Task]:
+    if photographer_agent and input_prompt.product_images:
+        return asyncio.create_task(
+            asyncio.wait_for(generate_image(input_prompt, force_refresh, candidate_count), IMAGE_TIMEOUT_SECONDS)
         )
+    return None
+
+
+async def run_workflow_job(job: Job, jobs: JobQueue) -> None:
+    """Run the writer and photographer stages of a queued job, skipping ones that already succeeded"""
+    input_prompt = InputPrompt(**job.input_prompt)
+    force_refresh = bool(job.options.get("force_refresh"))
+    candidate_count = job.options.get("candidate_count")
+    platforms = job.options.get("platforms") or []
+    print(f"🚀 Starting job {job.id} for product: {input_prompt.product_name}")
+
+    async def writer_stage():
+        if job.stages.get("writer") == SUCCEEDED:
+            return
+        await jobs.set_stage(job.id, "writer", RUNNING)
+        if platforms:
+            writer = generate_captions(input_prompt, platforms, force_refresh)
+        else:
+            writer = generate_caption(input_prompt, force_refresh)
+        try:
+            try:
+                writer_result = await asyncio.wait_for(writer, CAPTION_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"Caption generation timed out after {CAPTION_TIMEOUT_SECONDS:.0f}s")
+        except Exception as e:
+            await jobs.set_stage(job.id, "writer", FAILED)
+            raise RuntimeError(f"Failed to generate content: {e}")
+        if platforms:
+            await jobs.set_stage(
+                job.id, "writer", SUCCEEDED, caption=writer_result[platforms[0]], captions=writer_result
+            )
+        else:
+            await jobs.set_stage(job.id, "writer", SUCCEEDED, caption=writer_result)
+
+    async def photographer_stage():
+        if job.stages.get("photographer") in (SUCCEEDED, SKIPPED):
+            return
+        image_task = _start_image_task(input_prompt, force_refresh, candidate_count)
+        if not image_task:
+            await jobs.set_stage(job.id, "photographer", SKIPPED, image=_fallback_image_url(input_prompt.product_images))
+            return
+        await jobs.set_stage(job.id, "photographer", RUNNING)
+        image_url, gallery = await _resolve_images(image_task, input_prompt.product_images)
+        # Without a generated image the job still succeeds with the upload, but the stage can be retried
+        await jobs.set_stage(
+            job.id,
+            "photographer",
+            SUCCEEDED if gallery else FAILED,
+            image=image_url,
+            gallery=gallery,
+        )
+
+    results = await asyncio.gather(writer_stage(), photographer_stage(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def process_batch_item(input_prompt: InputPrompt) -> Dict[str, Any]:
+    """Generate one batch item, throttling each provider call through its rate limiter"""
+    async def limited_caption():
+        async with writer_rate_limiter:
+            return await asyncio.wait_for(generate_caption(input_prompt), CAPTION_TIMEOUT_SECONDS)
+
+    async def limited_image():
+        async with photographer_rate_limiter:
+            return await asyncio.wait_for(generate_image(input_prompt), IMAGE_TIMEOUT_SECONDS)
+
+    image_task = None
+    if photographer_agent and input_prompt.product_images:
+        image_task = asyncio.create_task(limited_image())
+    try:
+        try:
+            caption = await limited_caption()
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Caption generation timed out after {CAPTION_TIMEOUT_SECONDS:.0f}s")
+        image_url, gallery = await _resolve_images(image_task, input_prompt.product_images)
+    finally:
+        if image_task and not image_task.done():
+            image_task.cancel()
+    return {"caption": caption, "image": image_url, "gallery": gallery}
+
+
+def _ndjson(data: Dict[str, Any]) -> str:
+    return json.dumps(data) + "\n"
+
+
+def _stream_batch(batch_id: str) -> StreamingResponse:
+    """Stream a batch summary line, one line per item as it finishes, then the final summary"""
+    async def lines():
+        yield _ndjson({"event": "batch", **await run_blocking(batch_store.summary, batch_id)})
+        async for result in run_batch(
+            batch_store, batch_id, process_batch_item, concurrency=BATCH_CONCURRENCY, uploads_dir=UPLOADS_DIR
+        ):
+            yield _ndjson({"event": "item", **result})
+        yield _ndjson({"event": "done", **await run_blocking(batch_store.summary, batch_id)})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/")
+async def root():
+    """Health check endpoint"""
+    return {
+        "message": "AgenticMarketers API is running",
+        "status": "healthy",
+    }
+
+@app.post("/start_workflow", response_model=WorkflowResponse)
+async def start_workflow(submission: WorkflowSubmission = Depends(workflow_form)):
+    """
+    Main workflow endpoint that processes form data with file uploads and generates content
+    """
+    try:
+        with stage("workflow", product=submission.input_prompt.product_name or ""):
+            input_prompt = submission.input_prompt
+
+            # Process uploaded images
+            image_paths = await save_uploads(submission.uploads)
+            input_prompt.product_images = image_paths
+        
+            # Generate content using WriterAgent
+            print(f"🚀 Starting workflow for product: {input_prompt.product_name}")
+
+            # Run the writer and photographer branches side by side; each one has
+            # its own timeout so a slow image never holds back the caption.
+            if submission.platforms:
+                writer = generate_captions(input_prompt, submission.platforms, submission.force_refresh)
+            else:
+                writer = generate_caption(input_prompt, submission.force_refresh)
+            caption_task = asyncio.create_task(asyncio.wait_for(writer, CAPTION_TIMEOUT_SECONDS))
+            image_task = _start_image_task(input_prompt, submission.force_refresh, submission.candidate_count)
+
+            try:
+                try:
+                    writer_result = await caption_task
+                except asyncio.TimeoutError:
+                    raise RuntimeError(f"Caption generation timed out after {CAPTION_TIMEOUT_SECONDS:.0f}s")
+                if submission.platforms:
+                    captions, caption = writer_result, writer_result[submission.platforms[0]]
+                else:
+                    captions, caption = {}, writer_result
+
+                # Generate image using photographer agent or use uploaded image
+                image_url, gallery = await _resolve_images(image_task, image_paths)
+            finally:
+                # Cancel whichever branch is still running (caption failure or client disconnect)
+                for task in (caption_task, image_task):
+                    if task and not task.done():
+                        task.cancel()
+
+            return WorkflowResponse(
+                success=True,
+                message="Content generated successfully!",
+                caption=caption,
+                captions=captions,
+                image=image_url,
+                gallery=gallery
+            )
         
+    except HTTPException:
+        # Request errors (e.g. 413 for an oversized upload) keep their status code
+        raise
     except Exception as e:
         print(f"❌ Workflow error: {e}")
         return WorkflowResponse(
@@ -268,37 +881,230 @@ async def start_workflow(
             image=None
         )
 
+
+@app.post("/start_workflow/stream")
+async def start_workflow_stream(submission: WorkflowSubmission = Depends(workflow_form)):
+    """
+    Streaming workflow endpoint. Emits server-sent events:
+    caption_delta (text chunks as generated), caption (full text), image (when ready),
+    done (final WorkflowResponse) or error. With platforms, a single captions event
+    (one caption per platform) replaces the caption_delta events.
+    """
+    input_prompt = submission.input_prompt
+    try:
+        input_prompt.product_images = await save_uploads(submission.uploads)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Workflow error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to save uploads: {e}")
+
+    async def events():
+        print(f"🚀 Starting streaming workflow for product: {input_prompt.product_name}")
+        image_task = _start_image_task(input_prompt, submission.force_refresh, submission.candidate_count)
+        image_url, gallery = None, []
+        caption_parts: List[str] = []
+        captions: Dict[str, str] = {}
+        try:
+            try:
+                if submission.platforms:
+                    # Structured output is not streamed; the variants arrive together
+                    captions = await asyncio.wait_for(
+                        generate_captions(input_prompt, submission.platforms, submission.force_refresh),
+                        CAPTION_TIMEOUT_SECONDS,
+                    )
+                    caption_parts.append(captions[submission.platforms[0]])
+                    yield _sse("captions", {"captions": captions})
+                else:
+                    async for chunk in stream_caption(input_prompt, submission.force_refresh):
+                        caption_parts.append(chunk)
+                        yield _sse("caption_delta", {"text": chunk})
+                        # Push the image as soon as it is ready rather than after the caption
+                        if image_task and image_task.done() and image_url is None:
+                            image_url, gallery = await _resolve_images(image_task, input_prompt.product_images)
+                            yield _sse("image", {"image": image_url, "gallery": gallery})
+            except asyncio.TimeoutError:
+                yield _sse("error", {"message": f"Caption generation timed out after {CAPTION_TIMEOUT_SECONDS:.0f}s"})
+                return
+            except Exception as e:
+                print(f"❌ Workflow error: {e}")
+                yield _sse("error", {"message": f"Failed to generate content: {str(e)}"})
+                return
+
+            caption = "".join(caption_parts)
+            yield _sse("caption", {"caption": caption})
+
+            if image_url is None:
+                image_url, gallery = await _resolve_images(image_task, input_prompt.product_images)
+                yield _sse("image", {"image": image_url, "gallery": gallery})
+
+            response = WorkflowResponse(
+                success=True,
+                message="Content generated successfully!",
+                caption=caption,
+                captions=captions,
+                image=image_url,
+                gallery=gallery
+            )
+            yield _sse("done", response.model_dump())
+        finally:
+            if image_task and not image_task.done():
+                image_task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/jobs", status_code=202)
+async def submit_job(submission: WorkflowSubmission = Depends(workflow_form)):
+    """Queue a workflow and return its job ID immediately"""
+    input_prompt = submission.input_prompt
+    input_prompt.product_images = await save_uploads(submission.uploads)
+    try:
+        job = await job_queue.submit(
+            asdict(input_prompt),
+            {
+                "force_refresh": submission.force_refresh,
+                "candidate_count": submission.candidate_count,
+                "platforms": submission.platforms,
+            },
+        )
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later")
+    return job.to_status()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status with per-stage progress"""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_status()
+
+
+@app.get("/jobs/{job_id}/result", response_model=WorkflowResponse)
+async def get_job_result(job_id: str):
+    """Result of a finished job"""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job.status in (QUEUED, RUNNING):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if job.status == FAILED:
+        return WorkflowResponse(
+            success=False,
+            message=job.error or "Failed to generate content",
+            caption=job.caption,
+            captions=job.captions,
+            image=job.image,
+            gallery=job.gallery,
+        )
+    return WorkflowResponse(
+        success=True,
+        message="Content generated successfully!",
+        caption=job.caption,
+        captions=job.captions,
+        image=job.image,
+        gallery=job.gallery
+    )
+
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    """Re-run the failed stages of a job"""
+    try:
+        job = await job_queue.retry(job_id)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_status()
+
+
+@app.post("/batches")
+async def submit_batch(file: UploadFile = File(...)):
+    """Run a JSONL/CSV batch of InputPrompt records, streaming NDJSON results as items finish"""
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Batch file is too large")
+    data = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Batch file is too large")
+    try:
+        records = parse_batch_records(data, file.filename or "")
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse batch file: {e}")
+    if not records:
+        raise HTTPException(status_code=400, detail="Batch file has no records")
+    batch_id = await run_blocking(batch_store.create, records)
+    print(f"🚀 Starting batch {batch_id} with {len(records)} items")
+    return _stream_batch(batch_id)
+
+
+@app.post("/batches/{batch_id}/resume")
+async def resume_batch(batch_id: str):
+    """Re-run the items of a batch that did not succeed, streaming NDJSON results"""
+    if not await run_blocking(batch_store.exists, batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    print(f"🔁 Resuming batch {batch_id}")
+    return _stream_batch(batch_id)
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Batch summary with per-item results"""
+    if not await run_blocking(batch_store.exists, batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    summary = await run_blocking(batch_store.summary, batch_id)
+    items = await run_blocking(batch_store.items, batch_id)
+    return {**summary, "items": [item.to_result() for item in items]}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage latency histograms and provider error/retry counters in the Prometheus text format"""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
+    # Job counts come from SQLite; keep the query off the event loop
+    jobs = await run_blocking(job_queue.stats) if job_queue else None
     return {
         "status": "healthy",
         "agentcore_configured": bool(AGENT_CORE_ARN and AGENT_CORE_SESSION_ID),
         "aws_configured": bool(os.getenv("AWS_ACCESS_KEY_ID")),
+        "agentcore_pool": agentcore_client.stats() if agentcore_client else None,
+        "jobs": jobs,
+        "photographer": photographer_agent.reference_stats() if photographer_agent else None,
+        "result_cache": result_cache.stats() if result_cache else None,
         "environment": "development"
     }
 
 
-async def invoke_agent_agentcore(prompt: str):
+def _invoke_agent_agentcore_sync(prompt: str, platforms: Optional[List[str]] = None):
+    request = {"prompt": prompt}
+    if platforms:
+        request["platforms"] = platforms
+    response_data = agentcore_client.invoke(
+        agent_runtime_arn=AGENT_CORE_ARN,
+        session_id=AGENT_CORE_SESSION_ID,
+        payload={"input": request},
+    )
+    print("Agent Response:", response_data)
+    return response_data
+
+
+async def invoke_agent_agentcore(prompt: str, platforms: Optional[List[str]] = None):
     """
-    Invoke the AgentCore agent with a dynamic prompt
+    Invoke the AgentCore agent with a dynamic prompt, optionally asking for one caption per platform
     """
     try:
-        client = boto3.client('bedrock-agentcore', region_name='us-west-2')
-        payload = json.dumps({
-            "input": {"prompt": prompt}
-        })
-
-        response = client.invoke_agent_runtime(
-            agentRuntimeArn=AGENT_CORE_ARN,
-            runtimeSessionId=AGENT_CORE_SESSION_ID,
-            payload=payload,
-            qualifier="DEFAULT"
-        )
-        response_body = response['response'].read()
-        response_data = json.loads(response_body)
-        print("Agent Response:", response_data)
-        return response_data
+        # boto3 and the response stream read are blocking; keep them off the event loop
+        return await run_blocking(_invoke_agent_agentcore_sync, prompt, platforms)
     except Exception as e:
         print(f"❌ AgentCore invocation error: {e}")
         raise e
@@ -0,0 +1,89 @@
+"""
+Responsive renditions of generated images.
+
+Each generated image is resized to a set of widths and encoded as WebP and
+JPEG. File names are derived from the encoded bytes, so a rendition URL
+always refers to the same content and can be cached by browsers and CDNs
+indefinitely. Rendering is blocking; call it off the event loop.
+"""
+
+import hashlib
+import os
+import threading
+from io import BytesIO
+from typing import Dict, Iterable, List
+
+from PIL import Image
+from fastapi.staticfiles import StaticFiles
+
+# Format name -> (PIL format, save options)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# {format: {width: url}}, e.g. {"webp": {"320": "/uploads/renditions/ab12..._320w.webp"}}
+Renditions = Dict[str, Dict[str, str]]
+
+
+def parse_widths(value: str) -> List[int]:
+    """Parse a comma-separated width list such as "320,640,1024" """
+    return sorted({int(width) for width in value.split(",") if width.strip()})
+
+
+def rendition_widths(image_width: int, widths: Iterable[int]) -> List[int]:
+    """Requested widths that do not upscale; the image's own width when all of them would"""
+    return sorted({width for width in widths if width <= image_width}) or [image_width]
+
+
+def write_renditions(
+    image: Image.Image,
+    directory: str,
+    url_prefix: str,
+    widths: Iterable[int],
+    formats: Iterable[str] = ("webp", "jpeg"),
+) -> Renditions:
+    """Write every width/format rendition of ``image`` to ``directory`` and return their URLs"""
+    os.makedirs(directory, exist_ok=True)
+    renditions: Renditions = {name: {} for name in formats}
+    for width in rendition_widths(image.width, widths):
+        resized = image
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for name in renditions:
+            pil_format, options = RENDITION_FORMATS[name]
+            frame = resized
+            if pil_format == "JPEG" and frame.mode != "RGB":
+                frame = frame.convert("RGB")
+            buffer = BytesIO()
+            frame.save(buffer, format=pil_format, **options)
+            data = buffer.getvalue()
+
+            filename = f"{hashlib.sha256(data).hexdigest()[:20]}_{width}w.{name}"
+            path = os.path.join(directory, filename)
+            if not os.path.exists(path):
+                # Write then rename so a concurrent reader never gets a partial file
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as handle:
+                    handle.write(data)
+                os.replace(temp_path, path)
+            renditions[name][str(width)] = f"{url_prefix}/{filename}"
+    return renditions
+
+
+def srcset(urls_by_width: Dict[str, str]) -> str:
+    """Format one format's renditions as an HTML srcset value"""
+    return ", ".join(f"{url} {width}w" for width, url in sorted(urls_by_width.items(), key=lambda item: int(item[0])))
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for content-addressed files, served with a long-lived immutable Cache-Control"""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
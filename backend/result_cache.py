@@ -0,0 +1,146 @@
+"""
+Two-tier cache for generation results (captions and generated images).
+
+Keys are canonical hashes of everything that determines a result: the
+normalized InputPrompt, the prompt text, model IDs, temperature and reference
+image digests. Entries live in an in-memory LRU and in JSON files on disk, and
+each entry carries its own expiry. Methods are blocking; call them off the
+event loop.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Any, Dict, Optional, Tuple
+
+from prompts.InputPrompt import InputPrompt
+
+
+def normalize_input_prompt(input_prompt: InputPrompt) -> Dict[str, Any]:
+    """InputPrompt fields with whitespace collapsed and empty values dropped.
+
+    ``product_images`` is excluded because upload paths differ between
+    identical requests; callers include the image digests instead.
+    """
+    normalized: Dict[str, Any] = {}
+    for name, value in asdict(input_prompt).items():
+        if name == "product_images" or value in (None, "", []):
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        elif isinstance(value, list):
+            value = [" ".join(str(item).split()) for item in value]
+        normalized[name] = value
+    return normalized
+
+
+def canonical_key(**parts: Any) -> str:
+    """Stable hash of keyword parts; order and JSON formatting do not matter"""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        directory: Optional[str],
+        *,
+        max_entries: int = 512,
+        ttl_seconds: float = 24 * 3600,
+    ) -> None:
+        self._directory = directory
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        if self._directory:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as handle:
+                    stored = json.load(handle)
+            except (OSError, json.JSONDecodeError):
+                stored = None
+            if stored is not None:
+                if stored["expires_at"] > now:
+                    self._remember(key, stored["expires_at"], stored["value"])
+                    with self._lock:
+                        self.disk_hits += 1
+                    return stored["value"]
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + (ttl_seconds if ttl_seconds is not None else self._ttl_seconds)
+        self._remember(key, expires_at, value)
+        if self._directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial entry
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump({"expires_at": expires_at, "value": value}, handle)
+            os.replace(temp_path, path)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
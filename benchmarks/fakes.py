@@ -0,0 +1,295 @@
+"""
+Local stand-ins for the external providers, with configurable latency.
+
+- ``FakeAgentCoreRuntime`` replaces the boto3 ``bedrock-agentcore`` client
+  used by ``backend.agentcore_client.AgentCoreClient``.
+- ``FakeBedrockModel`` is a Strands ``Model`` streaming a canned caption and
+  reporting Bedrock-style prompt cache usage.
+- ``FakeGenaiClient`` replaces ``genai.Client`` for ``GeminiPhotographer``.
+
+Every stub sleeps for a duration drawn from a ``Latency`` distribution, so
+benchmarks exercise the real concurrency, parsing and image handling code
+without network calls or tokens.
+"""
+
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from PIL import Image
+from botocore.exceptions import ClientError
+from google.genai import errors, types
+from strands.models import Model
+from strands.types._events import ModelStreamChunkEvent
+
+CAPTION = (
+    "✨ Meet your new favourite bottle! Keeps drinks ice cold for 24 hours and hot for 12. "
+    "Leak-proof, dishwasher safe and ready for every adventure. 🌊🏔️\n\n"
+    "#StayHydrated #EcoFriendly #AdventureReady #ReusableBottle #DailyEssentials"
+)
+
+
+@dataclass
+class Latency:
+    """A latency distribution in seconds.
+
+    Parsed from specs such as ``fixed:200``, ``uniform:100:300``,
+    ``normal:800:100`` (mean, stddev) or ``lognormal:800:0.35`` (median,
+    sigma); all values except sigma are milliseconds.
+    """
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, *values = spec.split(":")
+        numbers = [float(value) for value in values] + [0.0, 0.0]
+        if kind not in {"fixed", "uniform", "normal", "lognormal"}:
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+        return cls(kind, numbers[0], numbers[1])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            millis = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            millis = rng.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            millis = self.a * math.exp(rng.gauss(0.0, self.b))
+        else:
+            millis = self.a
+        return max(0.0, millis) / 1000.0
+
+
+class _Sampler:
+    """Thread-safe latency sampling; random.Random is not safe to share across threads"""
+
+    def __init__(self, latency: Latency, seed: Optional[int]) -> None:
+        self._latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self) -> float:
+        with self._lock:
+            return self._latency.sample(self._rng)
+
+
+def _chunks(text: str, count: int) -> List[str]:
+    size = max(1, math.ceil(len(text) / count))
+    return [text[index:index + size] for index in range(0, len(text), size)]
+
+
+class _RuntimeBody:
+    def __init__(self, payload: bytes, events: List[str], chunk_delay: _Sampler) -> None:
+        self._payload = payload
+        self._events = events
+        self._chunk_delay = chunk_delay
+
+    def read(self) -> bytes:
+        return self._payload
+
+    def iter_lines(self, chunk_size: int = 1) -> Iterator[bytes]:
+        for event in self._events:
+            time.sleep(self._chunk_delay())
+            yield f"data: {json.dumps(event)}".encode("utf-8")
+            yield b""
+
+
+class FakeAgentCoreRuntime:
+    """Stub of the boto3 ``bedrock-agentcore`` client's ``invoke_agent_runtime``"""
+
+    def __init__(
+        self,
+        latency: Latency,
+        chunk_latency: Optional[Latency] = None,
+        chunks: int = 20,
+        caption: str = CAPTION,
+        seed: Optional[int] = None,
+    ) -> None:
+        self._latency = _Sampler(latency, seed)
+        self._chunk_latency = _Sampler(chunk_latency or Latency(), seed)
+        self._chunks = chunks
+        self._caption = caption
+
+    def invoke_agent_runtime(self, **kwargs: Any) -> dict:
+        payload = json.loads(kwargs["payload"])
+        request = payload.get("input") or payload
+        streaming = bool(request.get("stream"))
+        # Time to first byte; a non-streaming call also pays for the whole generation
+        time.sleep(self._latency())
+        if streaming:
+            body = _RuntimeBody(b"", _chunks(self._caption, self._chunks), self._chunk_latency)
+            content_type = "text/event-stream"
+        else:
+            # Same payloads as agentcore_app.invoke: captions per platform, or the str() of the agent message
+            platforms = request.get("platforms")
+            if platforms:
+                result = {"captions": {platform: self._caption for platform in platforms}}
+            else:
+                result = {"result": str({"role": "assistant", "content": [{"text": self._caption}]})}
+            body = _RuntimeBody(json.dumps(result).encode("utf-8"), [], self._chunk_latency)
+            content_type = "application/json"
+        return {"contentType": content_type, "response": body, "ResponseMetadata": {"RetryAttempts": 0}}
+
+
+def _metadata(prompt_chars: int, output_chars: int, cache_usage: dict) -> dict:
+    # Rough estimate of four characters per token
+    input_tokens, output_tokens = prompt_chars // 4, output_chars // 4
+    return {
+        "usage": {
+            "inputTokens": input_tokens,
+            "outputTokens": output_tokens,
+            "totalTokens": input_tokens + output_tokens,
+            **cache_usage,
+        },
+        "metrics": {"latencyMs": 0},
+    }
+
+
+class FakeBedrockModel(Model):
+    """Strands model that streams a canned caption after a time-to-first-token delay.
+
+    With ``cache_prompt`` or ``cache_tools`` configured, the first call with a
+    given system prompt reports it as written to the prompt cache and later
+    calls as read from it. Without ``supports_caching`` such calls fail the way
+    Bedrock does for models without prompt caching.
+    """
+
+    def __init__(
+        self,
+        latency: Latency,
+        chunk_latency: Optional[Latency] = None,
+        chunks: int = 20,
+        caption: str = CAPTION,
+        seed: Optional[int] = None,
+        supports_caching: bool = True,
+        **config: Any,
+    ) -> None:
+        self._latency = _Sampler(latency, seed)
+        self._chunk_latency = _Sampler(chunk_latency or Latency(), seed)
+        self._chunks = chunks
+        self._caption = caption
+        self._supports_caching = supports_caching
+        self._cached_prefixes = set()
+        self.config = {"model_id": "fake-bedrock", **config}
+
+    def update_config(self, **model_config: Any) -> None:
+        self.config.update(model_config)
+
+    def get_config(self) -> Any:
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        # Every string field gets the canned caption, after one generation's worth of latency
+        cache_usage = self._cache_usage(system_prompt, None)
+        prompt_chars = len(json.dumps(prompt, default=str))
+        if not cache_usage:
+            prompt_chars += len(system_prompt or "")
+        await asyncio.sleep(self._latency())
+        fields = {name: self._caption for name in output_model.model_fields}
+        # Usage arrives as a raw stream chunk, as with Bedrock's structured output
+        yield ModelStreamChunkEvent(chunk={"metadata": _metadata(prompt_chars, len(json.dumps(fields)), cache_usage)})
+        yield {"output": output_model(**fields)}
+
+    def _cache_usage(self, system_prompt: Optional[str], tool_specs: Any) -> dict:
+        if not (self.config.get("cache_prompt") or self.config.get("cache_tools")):
+            return {}
+        if not self._supports_caching:
+            raise ClientError(
+                {"Error": {"Code": "ValidationException", "Message": "This model doesn't support prompt caching."}},
+                "ConverseStream",
+            )
+        prefix = (system_prompt or "") + json.dumps(tool_specs or [], default=str)
+        if prefix in self._cached_prefixes:
+            return {"cacheReadInputTokens": len(prefix) // 4, "cacheWriteInputTokens": 0}
+        self._cached_prefixes.add(prefix)
+        return {"cacheReadInputTokens": 0, "cacheWriteInputTokens": len(prefix) // 4}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncIterator[dict]:
+        cache_usage = self._cache_usage(system_prompt, tool_specs)
+        # Rough token estimate so input growth across turns stays visible; cached tokens are not input tokens
+        prompt_chars = len(json.dumps(messages, default=str))
+        if not cache_usage:
+            prompt_chars += len(system_prompt or "")
+        await asyncio.sleep(self._latency())
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}}}
+        for chunk in _chunks(self._caption, self._chunks):
+            await asyncio.sleep(self._chunk_latency())
+            yield {"contentBlockDelta": {"delta": {"text": chunk}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": _metadata(prompt_chars, len(self._caption), cache_usage)}
+
+
+def _photo_like_png(size: int) -> bytes:
+    """Smooth gradients with light grain, so decode and re-encode costs resemble a generated photo"""
+    gradient = Image.linear_gradient("L").resize((size, size))
+    channels = [gradient, gradient.rotate(90), Image.radial_gradient("L").resize((size, size))]
+    image = Image.merge("RGB", channels)
+    grain = Image.merge("RGB", [Image.effect_noise((size, size), 24)] * 3)
+    buffer = BytesIO()
+    Image.blend(image, grain, 0.15).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _FakeFiles:
+    def __init__(self, latency: _Sampler) -> None:
+        self._latency = latency
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def upload(self, file, config=None):
+        file.read()
+        time.sleep(self._latency())
+        with self._lock:
+            self._count += 1
+            name = f"files/fake-{self._count}"
+        mime_type = getattr(config, "mime_type", None) or "image/jpeg"
+        return SimpleNamespace(uri=f"https://fake.invalid/{name}", name=name, mime_type=mime_type, expiration_time=None)
+
+
+class _FakeModels:
+    def __init__(self, latency: _Sampler, image_size: int, multiple_candidates: bool) -> None:
+        self._latency = latency
+        self._image = _photo_like_png(image_size)
+        self._multiple_candidates = multiple_candidates
+
+    def generate_content(self, model, contents, config=None):
+        candidate_count = (getattr(config, "candidate_count", None) or 1) if config else 1
+        if candidate_count > 1 and not self._multiple_candidates:
+            raise errors.ClientError(
+                400,
+                {"error": {"code": 400, "message": "Multiple candidates is not enabled for this model", "status": "INVALID_ARGUMENT"}},
+            )
+        time.sleep(self._latency())
+        part = types.Part(inline_data=types.Blob(data=self._image, mime_type="image/png"))
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(content=types.Content(role="model", parts=[part]), index=index)
+                for index in range(candidate_count)
+            ]
+        )
+
+
+class FakeGenaiClient:
+    """Stub of ``genai.Client`` covering ``files.upload`` and ``models.generate_content``"""
+
+    def __init__(
+        self,
+        latency: Latency,
+        upload_latency: Optional[Latency] = None,
+        image_size: int = 1024,
+        multiple_candidates: bool = True,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.files = _FakeFiles(_Sampler(upload_latency or Latency(), seed))
+        self.models = _FakeModels(_Sampler(latency, seed), image_size, multiple_candidates)
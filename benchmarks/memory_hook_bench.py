@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: MemoryHook.on_message_added cost as the conversation grows.
+
+Feeds messages through the hook with a stub memory client (no network) and
+reports the mean per-message cost at several history sizes. The cost should
+stay flat; for reference the table also shows what a deepcopy of the same
+history costs, which the hook used to pay on every message.
+
+Usage:
+    python benchmarks/memory_hook_bench.py --sizes 10 100 1000 5000
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strands.hooks.events import MessageAddedEvent
+
+from agents.writer.memory_hook import MemoryHook, MemoryWriter
+
+
+class StubMemoryClient:
+    def retrieve_memories(self, **kwargs: Any) -> List[Dict[str, Any]]:
+        return []
+
+    def save_conversation(self, **kwargs: Any) -> Dict[str, Any]:
+        return {}
+
+
+def _message(index: int) -> Dict[str, Any]:
+    role = "user" if index % 2 == 0 else "assistant"
+    return {"role": role, "content": [{"text": f"Message {index}: " + "lorem ipsum dolor sit amet " * 8}]}
+
+
+def per_message_seconds(hook: MemoryHook, agent: SimpleNamespace, samples: int) -> float:
+    """Mean time for the hook to handle one new message at the current history size"""
+    start = time.perf_counter()
+    for index in range(samples):
+        message = _message(len(agent.messages))
+        agent.messages.append(message)
+        hook.on_message_added(MessageAddedEvent(agent=agent, message=message))
+    elapsed = time.perf_counter() - start
+    # Drop the sampled messages so the next size starts from an exact history length
+    del agent.messages[-samples:]
+    return elapsed / samples
+
+
+def deepcopy_seconds(messages: List[Dict[str, Any]], samples: int) -> float:
+    start = time.perf_counter()
+    for _ in range(samples):
+        copy.deepcopy(messages)
+    return (time.perf_counter() - start) / samples
+
+
+def main(args: argparse.Namespace) -> None:
+    client = StubMemoryClient()
+    # Large queue so the benchmark measures the hook, not backpressure
+    writer = MemoryWriter(client, max_queue_size=1_000_000, max_batch_messages=100)
+    hook = MemoryHook(client, memory_id="bench", actor_id="bench", session_id="bench", writer=writer)
+    agent = SimpleNamespace(messages=[])
+
+    print(f"{'history':>10}{'hook µs/msg':>14}{'deepcopy µs':>14}")
+    for size in sorted(args.sizes):
+        agent.messages.extend(_message(index) for index in range(len(agent.messages), size))
+        hook_cost = per_message_seconds(hook, agent, args.samples)
+        copy_cost = deepcopy_seconds(agent.messages, max(1, min(args.samples, 20)))
+        print(f"{size:>10}{hook_cost * 1e6:>14.1f}{copy_cost * 1e6:>14.1f}")
+    writer.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Per-message cost of MemoryHook.on_message_added vs history size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000], help="History sizes to measure")
+    parser.add_argument("--samples", type=int, default=200, help="Messages timed per size")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
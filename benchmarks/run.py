@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the workflow, the writer and the photographer.
+
+External providers are replaced by the stubs in ``benchmarks/fakes.py``, so
+runs cost no tokens and need no credentials. Each scenario issues
+``--requests`` operations at ``--concurrency`` and reports throughput,
+p50/p95/p99 latency and the peak RSS reached while it ran.
+
+Scenarios:
+    workflow          POST /start_workflow through the FastAPI app (AgentCore + Gemini stubs)
+    writer_invoke     WriterAgent.invoke with a stub Bedrock model
+    writer_stream     WriterAgent.stream with a stub Bedrock model
+    photographer      GeminiPhotographer.generate_images with a stub genai.Client
+
+Usage:
+    python benchmarks/run.py --concurrency 8 --requests 64
+    python benchmarks/run.py writer_stream --model-latency lognormal:600:0.3 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from benchmarks.fakes import CAPTION, FakeAgentCoreRuntime, FakeBedrockModel, FakeGenaiClient, Latency
+
+SCENARIOS = ("workflow", "writer_invoke", "writer_stream", "photographer")
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    requests: int
+    errors: int
+    concurrency: int
+    wall_seconds: float
+    throughput_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_rss_mb: float
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def _current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """Tracks the peak RSS while a scenario runs.
+
+    Samples /proc/self/status so each scenario gets its own peak; elsewhere
+    falls back to the process-wide ru_maxrss.
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.peak_bytes = 0
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, _current_rss_bytes() or 0)
+            time.sleep(self._interval)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        if not self.peak_bytes:
+            # ru_maxrss is kilobytes on Linux and bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_bytes = maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+async def drive(
+    scenario: str, operation: Callable[[int], Awaitable[None]], requests: int, concurrency: int
+) -> ScenarioResult:
+    """Run ``operation`` ``requests`` times with at most ``concurrency`` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await operation(index)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"❌ {scenario} request {index} failed: {e}")
+            latencies.append(time.perf_counter() - start)
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(requests)))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    return ScenarioResult(
+        scenario=scenario,
+        requests=requests,
+        errors=errors,
+        concurrency=concurrency,
+        wall_seconds=wall,
+        throughput_per_second=requests / wall if wall else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        peak_rss_mb=rss.peak_bytes / (1024 * 1024),
+    )
+
+
+def _product_jpeg(size: int = 1600) -> bytes:
+    buffer = BytesIO()
+    Image.effect_noise((size, size), 32).convert("RGB").save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _fake_genai_client(args: argparse.Namespace) -> FakeGenaiClient:
+    return FakeGenaiClient(
+        Latency.parse(args.gemini_latency),
+        upload_latency=Latency.parse(args.upload_latency),
+        image_size=args.image_size,
+        multiple_candidates=not args.single_candidate_model,
+        seed=args.seed,
+    )
+
+
+async def bench_workflow(args: argparse.Namespace) -> ScenarioResult:
+    """POST /start_workflow in-process through httpx's ASGI transport"""
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="agentic-marketers-bench-")
+    os.environ.update(
+        GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "benchmark"),
+        AGENT_CORE_ARN="arn:aws:bedrock-agentcore:us-west-2:000000000000:runtime/benchmark",
+        AGENT_CORE_SESSION_ID="benchmark-session-" + "0" * 24,
+        RESULT_CACHE_ENABLED="false",
+        JOBS_DB_PATH=os.path.join(workdir, "jobs.db"),
+        BATCH_DB_PATH=os.path.join(workdir, "batches.db"),
+        IMAGE_CANDIDATE_COUNT=str(args.candidates),
+    )
+    # The backend writes uploads and generated images relative to the working directory
+    os.chdir(workdir)
+    import backend.main as backend_main
+
+    backend_main.photographer_agent._client = _fake_genai_client(args)
+    product_image = _product_jpeg()
+
+    async with backend_main.lifespan(backend_main.app):
+        backend_main.agentcore_client._client = FakeAgentCoreRuntime(
+            Latency.parse(args.agentcore_latency), seed=args.seed
+        )
+        transport = httpx.ASGITransport(app=backend_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def operation(index: int) -> None:
+                response = await client.post(
+                    "/start_workflow",
+                    data={"product_name": f"Benchmark Bottle {index}", "product_description": "An insulated bottle"},
+                    files=[("product_images", (f"product_{index}.jpg", product_image, "image/jpeg"))],
+                )
+                response.raise_for_status()
+                body = response.json()
+                if not body.get("success"):
+                    raise RuntimeError(body.get("message"))
+                if body.get("caption") != CAPTION:
+                    raise RuntimeError(f"Unexpected caption: {body.get('caption')!r:.80}")
+
+            return await drive("workflow", operation, args.requests, args.concurrency)
+
+
+def _writer_pool(args: argparse.Namespace) -> "asyncio.Queue":
+    """One WriterAgent per concurrent slot; a Strands Agent handles one invocation at a time"""
+    from agents.writer.writer import WriterAgent
+    from strands.handlers.callback_handler import null_callback_handler
+
+    pool: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.concurrency):
+        model = FakeBedrockModel(
+            Latency.parse(args.model_latency), chunk_latency=Latency.parse(args.chunk_latency), seed=args.seed
+        )
+        writer = WriterAgent(model=model)
+        # Strands prints every streamed chunk by default; keep the report readable
+        writer.agent.callback_handler = null_callback_handler
+        pool.put_nowait(writer)
+    return pool
+
+
+async def bench_writer_invoke(args: argparse.Namespace) -> ScenarioResult:
+    pool = _writer_pool(args)
+    executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="bench-writer")
+    loop = asyncio.get_running_loop()
+
+    async def operation(index: int) -> None:
+        writer = await pool.get()
+        try:
+            # Raises WriterError on failure
+            await loop.run_in_executor(executor, writer.invoke, None, f"Write a caption for product {index}")
+        finally:
+            pool.put_nowait(writer)
+
+    try:
+        return await drive("writer_invoke", operation, args.requests, args.concurrency)
+    finally:
+        executor.shutdown()
+
+
+async def bench_writer_stream(args: argparse.Namespace) -> ScenarioResult:
+    pool = _writer_pool(args)
+
+    async def operation(index: int) -> None:
+        writer = await pool.get()
+        try:
+            chunks = [chunk async for chunk in writer.stream(query=f"Write a caption for product {index}")]
+            if not chunks:
+                raise RuntimeError("No output streamed")
+        finally:
+            pool.put_nowait(writer)
+
+    return await drive("writer_stream", operation, args.requests, args.concurrency)
+
+
+async def bench_photographer(args: argparse.Namespace) -> ScenarioResult:
+    from agents.photographer.photographer import GeminiImage, GeminiPhotographer
+
+    photographer = GeminiPhotographer(
+        api_key="benchmark", candidate_count=args.candidates, client=_fake_genai_client(args)
+    )
+    executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="bench-photographer")
+    loop = asyncio.get_running_loop()
+    product_image = _product_jpeg()
+
+    def generate(index: int) -> None:
+        # Distinct references per request so the upload cache only helps repeats
+        reference = GeminiImage.from_bytes(product_image if index % 2 else product_image + b"\0")
+        photographer.generate_images(f"Studio photo of product {index}", [reference])
+
+    try:
+        return await drive(
+            "photographer",
+            lambda index: loop.run_in_executor(executor, generate, index),
+            args.requests,
+            args.concurrency,
+        )
+    finally:
+        executor.shutdown()
+
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Awaitable[ScenarioResult]]] = {
+    "workflow": bench_workflow,
+    "writer_invoke": bench_writer_invoke,
+    "writer_stream": bench_writer_stream,
+    "photographer": bench_photographer,
+}
+
+
+def print_results(results: List[ScenarioResult]) -> None:
+    print("=" * 96)
+    print(
+        f"{'scenario':<15}{'reqs':>6}{'errors':>8}{'conc':>6}{'wall s':>9}{'req/s':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}"
+    )
+    for result in results:
+        print(
+            f"{result.scenario:<15}{result.requests:>6}{result.errors:>8}{result.concurrency:>6}"
+            f"{result.wall_seconds:>9.2f}{result.throughput_per_second:>9.2f}"
+            f"{result.p50_ms:>10.1f}{result.p95_ms:>10.1f}{result.p99_ms:>10.1f}{result.peak_rss_mb:>13.1f}"
+        )
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for scenario in args.scenarios or SCENARIOS:
+        print(f"🧪 Running {scenario}: {args.requests} requests at concurrency {args.concurrency}")
+        results.append(await BENCHMARKS[scenario](args))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"settings": vars(args), "results": [asdict(result) for result in results]}, handle, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmarks with stubbed Bedrock, AgentCore and Gemini")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--requests", type=int, default=32, help="Operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Operations in flight at once")
+    parser.add_argument("--agentcore-latency", default="lognormal:1500:0.3", help="AgentCore invoke latency")
+    parser.add_argument("--model-latency", default="lognormal:600:0.3", help="Bedrock time to first token")
+    parser.add_argument("--chunk-latency", default="fixed:20", help="Delay between streamed text chunks")
+    parser.add_argument("--gemini-latency", default="lognormal:4000:0.25", help="Gemini generate_content latency")
+    parser.add_argument("--upload-latency", default="lognormal:300:0.3", help="Gemini file upload latency")
+    parser.add_argument("--image-size", type=int, default=1024, help="Edge length of generated images in pixels")
+    parser.add_argument("--candidates", type=int, default=4, help="Image candidates per generation")
+    parser.add_argument(
+        "--single-candidate-model", action="store_true", help="Stub rejects candidate_count > 1, forcing the fallback"
+    )
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the latency distributions")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.json:
+        # The workflow scenario changes the working directory
+        args.json = os.path.abspath(args.json)
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,3 +1,6 @@
+import { useState } from 'react'
+import { GalleryImage } from '../../types'
+
 interface ContentPreviewProps {
   generatedContent: any
   parsedCaption: string
@@ -5,6 +8,20 @@ interface ContentPreviewProps {
 }
 
 export default function ContentPreview({ generatedContent, parsedCaption, onBackToForm }: ContentPreviewProps) {
+  const gallery: GalleryImage[] = generatedContent?.gallery || []
+  const [selectedImage, setSelectedImage] = useState<string | null>(null)
+  // Fall back to the main image until a variant is picked (or if the gallery changed)
+  const currentImage = gallery.some((variant) => variant.image === selectedImage) ? selectedImage : generatedContent?.image
+  const currentVariant = gallery.find((variant) => variant.image === currentImage)
+
+  // Responsive renditions for the preview; the full-size PNG is only fetched for download
+  const buildSrcSet = (format: string) =>
+    Object.entries(currentVariant?.renditions?.[format] || {})
+      .map(([width, url]) => `http://localhost:8000${url} ${width}w`)
+      .join(', ')
+  const webpSrcSet = buildSrcSet('webp')
+  const jpegSrcSet = buildSrcSet('jpeg')
+
   const handleCopyCaption = () => {
     navigator.clipboard.writeText(parsedCaption)
     alert('Caption copied to clipboard!')
@@ -12,7 +29,7 @@ export default function ContentPreview({ generatedContent, parsedCaption, onBack
 
   const handleDownloadImage = () => {
     const link = document.createElement('a')
-    const imageUrl = generatedContent?.image ? `http://localhost:8000${generatedContent.image}` : ""
+    const imageUrl = currentImage ? `http://localhost:8000${currentImage}` : ""
     link.href = imageUrl
     link.download = 'social-media-post.jpg'
     link.click()
@@ -32,11 +49,37 @@ export default function ContentPreview({ generatedContent, parsedCaption, onBack
       
       <div className="preview-content">
         <div className="preview-image">
-          <img 
-            src={generatedContent?.image ? `http://localhost:8000${generatedContent.image}` : "https://via.placeholder.com/400x400/000000/FFFFFF?text=Product+Image"} 
-            alt="Product"
-            className="image-content"
-          />
+          {webpSrcSet ? (
+            <picture>
+              <source type="image/webp" srcSet={webpSrcSet} sizes="(max-width: 768px) 100vw, 50vw" />
+              <img
+                src={`http://localhost:8000${currentVariant?.renditions?.jpeg?.['640'] || currentImage}`}
+                srcSet={jpegSrcSet}
+                sizes="(max-width: 768px) 100vw, 50vw"
+                alt="Product"
+                className="image-content"
+              />
+            </picture>
+          ) : (
+            <img 
+              src={currentImage ? `http://localhost:8000${currentImage}` : "https://via.placeholder.com/400x400/000000/FFFFFF?text=Product+Image"} 
+              alt="Product"
+              className="image-content"
+            />
+          )}
+          {gallery.length > 1 && (
+            <div className="image-gallery">
+              {gallery.map((variant, index) => (
+                <img
+                  key={variant.image}
+                  src={`http://localhost:8000${variant.thumbnail || variant.image}`}
+                  alt={`Variant ${index + 1}`}
+                  className={`gallery-thumbnail${variant.image === currentImage ? ' selected' : ''}`}
+                  onClick={() => setSelectedImage(variant.image)}
+                />
+              ))}
+            </div>
+          )}
         </div>
         
         <div className="preview-caption">
@@ -61,20 +61,60 @@ export function useWorkflow() {
         formDataToSend.append('product_images', file)
       })
       
-      const response = await fetch('http://localhost:8000/start_workflow', {
+      const response = await fetch('http://localhost:8000/start_workflow/stream', {
         method: 'POST',
         body: formDataToSend
       })
       
-      const result = await response.json()
-      
-      if (result.success) {
-        const caption = parseCaption(result.caption)
-        setParsedCaption(caption)
-        setGeneratedContent(result)
-        setShowPreview(true)
-      } else {
-        alert(`Error: ${result.message}`)
+      if (!response.ok || !response.body) {
+        throw new Error(`Request failed with status ${response.status}`)
+      }
+
+      // Read server-sent events: caption_delta, caption, image, done, error
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let captionSoFar = ''
+
+      const handleEvent = (event: string, data: any) => {
+        if (event === 'caption_delta') {
+          captionSoFar += data.text
+          setParsedCaption(captionSoFar)
+          setGeneratedContent((prev) => ({ ...(prev || { success: true, message: '' }), caption: captionSoFar }))
+          // Show the preview as soon as the first tokens arrive
+          setShowPreview(true)
+        } else if (event === 'caption') {
+          setParsedCaption(parseCaption(data.caption))
+        } else if (event === 'image') {
+          setGeneratedContent((prev) => ({ ...(prev || { success: true, message: '' }), image: data.image, gallery: data.gallery }))
+        } else if (event === 'done') {
+          setParsedCaption(parseCaption(data.caption))
+          setGeneratedContent(data)
+          setShowPreview(true)
+        } else if (event === 'error') {
+          alert(`Error: ${data.message}`)
+        }
+      }
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        let separator = buffer.indexOf('\n\n')
+        while (separator !== -1) {
+          const rawEvent = buffer.slice(0, separator)
+          buffer = buffer.slice(separator + 2)
+          separator = buffer.indexOf('\n\n')
+
+          let eventName = 'message'
+          let dataText = ''
+          rawEvent.split('\n').forEach((line) => {
+            if (line.startsWith('event: ')) eventName = line.slice(7)
+            else if (line.startsWith('data: ')) dataText += line.slice(6)
+          })
+          if (dataText) handleEvent(eventName, JSON.parse(dataText))
+        }
       }
     } catch (error) {
       alert('Failed to generate content. Please try again.')
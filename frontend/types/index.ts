@@ -25,9 +25,20 @@ export interface InputPromptData {
   post_processing_presets: string[]
 }
 
+export interface GalleryImage {
+  image: string
+  thumbnail?: string
+  // format -> width -> URL, e.g. renditions.webp['640']
+  renditions?: Record<string, Record<string, string>>
+  srcset?: Record<string, string>
+}
+
 export interface WorkflowResponse {
   success: boolean
   message: string
   caption?: string
+  // platform -> caption, when the request listed platforms
+  captions?: Record<string, string>
   image?: string
+  gallery?: GalleryImage[]
 }
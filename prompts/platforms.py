@@ -0,0 +1,30 @@
+from typing import Dict, List
+
+
+# Writing guidelines per social platform, keyed by the name used in requests
+PLATFORM_GUIDELINES: Dict[str, str] = {
+    "instagram": "Instagram caption: a strong hook in the first line, short paragraphs with emojis, "
+    "a call to action, then 5-10 relevant hashtags at the end.",
+    "x": "X (Twitter) post: at most 280 characters including hashtags, punchy and direct, "
+    "1-2 hashtags at most.",
+    "linkedin": "LinkedIn post: professional tone, lead with the business value, 3-5 short paragraphs, "
+    "few or no emojis, 3 hashtags at most.",
+    "tiktok": "TikTok caption: casual and trend-aware, at most 150 characters before the hashtags, "
+    "3-5 hashtags.",
+}
+
+
+def parse_platforms(value: str) -> List[str]:
+    """Comma-separated platform names, lowercased and deduplicated in order.
+
+    Raises ValueError on an unknown platform.
+    """
+    platforms: List[str] = []
+    for name in value.split(","):
+        name = name.strip().lower()
+        if not name or name in platforms:
+            continue
+        if name not in PLATFORM_GUIDELINES:
+            raise ValueError(f"Unknown platform '{name}'; expected one of {', '.join(PLATFORM_GUIDELINES)}")
+        platforms.append(name)
+    return platforms
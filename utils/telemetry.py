@@ -0,0 +1,232 @@
+"""
+Stage timing shared by the backend and the agents.
+
+``stage()`` wraps one step of a request (upload save, AgentCore invoke,
+Gemini generation, ...) in an OpenTelemetry span and records its duration in
+a histogram. Under ``opentelemetry-instrument`` the spans export through the
+configured OTel exporter; without the OTel API installed only the histograms
+are kept. Metrics are rendered in the Prometheus text format by
+``render_metrics()``.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from opentelemetry import trace
+
+    _tracer = trace.get_tracer("agentic_marketers")
+except ImportError:  # pragma: no cover - optional dependency
+    _tracer = None
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers quick disk writes up to slow multi-candidate image generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Tokens per model call; from a bare prompt up to a long conversation history
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._render_samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+        # Per label set: (non-cumulative bucket counts, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self._buckets), 0.0, 0)
+            for index, bound in enumerate(self._buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram(
+    "agentic_marketers_stage_duration_seconds",
+    "Time spent in one stage of a workflow request.",
+    ("stage", "outcome"),
+)
+PROVIDER_ERRORS = Counter(
+    "agentic_marketers_provider_errors_total",
+    "Failed calls to an external provider.",
+    ("provider", "error"),
+)
+PROVIDER_RETRIES = Counter(
+    "agentic_marketers_provider_retries_total",
+    "Retried calls to an external provider, including SDK-level retries.",
+    ("provider", "reason"),
+)
+
+MODEL_TOKENS = Histogram(
+    "agentic_marketers_model_tokens",
+    "Tokens per agent call: sent (input), generated (output), or read from / written to the prompt cache (cache_read, cache_write).",
+    ("agent", "direction"),
+    buckets=TOKEN_BUCKETS,
+)
+PROMPT_CACHE = Counter(
+    "agentic_marketers_prompt_cache_total",
+    "Model calls with prompt caching enabled, by whether the cached prefix was read (hit), written (write) or neither (miss).",
+    ("agent", "result"),
+)
+CONTEXT_TOKENS = Counter(
+    "agentic_marketers_context_tokens_total",
+    "Estimated tokens of assembled agent context (history, memories) before and after deduplication and budgeting.",
+    ("context", "stage"),
+)
+CONTEXT_DROPPED = Counter(
+    "agentic_marketers_context_dropped_total",
+    "History turns or memories left out of the assembled context, by reason (duplicate, over_budget).",
+    ("context", "reason"),
+)
+
+
+@contextmanager
+def stage(name: str, **attributes) -> Iterator[Optional["trace.Span"]]:
+    """Time one stage as an OTel span and a histogram observation.
+
+    Yields the span (None without OpenTelemetry) so callers can attach
+    attributes they only know once the stage has run.
+    """
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        if _tracer is None:
+            yield None
+        else:
+            with _tracer.start_as_current_span(f"agentic_marketers.{name}", attributes=attributes) as span:
+                yield span
+    except BaseException as e:
+        outcome = "cancelled" if type(e).__name__ in ("CancelledError", "GeneratorExit") else "error"
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name, outcome=outcome)
+
+
+def record_provider_error(provider: str, error: BaseException) -> None:
+    PROVIDER_ERRORS.inc(provider=provider, error=type(error).__name__)
+
+
+def record_provider_retry(provider: str, reason: str, count: int = 1) -> None:
+    if count > 0:
+        PROVIDER_RETRIES.inc(count, provider=provider, reason=reason)
+
+
+def record_model_tokens(agent: str, input_tokens: int, output_tokens: int) -> None:
+    MODEL_TOKENS.observe(input_tokens, agent=agent, direction="input")
+    MODEL_TOKENS.observe(output_tokens, agent=agent, direction="output")
+
+
+def record_prompt_cache(agent: str, read_tokens: int, write_tokens: int) -> None:
+    result = "hit" if read_tokens > 0 else "write" if write_tokens > 0 else "miss"
+    PROMPT_CACHE.inc(agent=agent, result=result)
+    if read_tokens > 0:
+        MODEL_TOKENS.observe(read_tokens, agent=agent, direction="cache_read")
+    if write_tokens > 0:
+        MODEL_TOKENS.observe(write_tokens, agent=agent, direction="cache_write")
+
+
+def record_context_assembly(
+    context: str, tokens_before: int, tokens_after: int, duplicates: int, over_budget: int
+) -> None:
+    CONTEXT_TOKENS.inc(tokens_before, context=context, stage="before")
+    CONTEXT_TOKENS.inc(tokens_after, context=context, stage="after")
+    if duplicates:
+        CONTEXT_DROPPED.inc(duplicates, context=context, reason="duplicate")
+    if over_budget:
+        CONTEXT_DROPPED.inc(over_budget, context=context, reason="over_budget")
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"